@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Import Time Benchmark
+Measures how long starting an analysis takes to import lib.gemini (and with
+it lib.media) in a fresh interpreter, with the optional media backends left
+unloaded and with all of them imported up front as they used to be.
+
+Usage: python benchmarks/import_time.py [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LAZY = "import lib.gemini"
+EAGER = (
+    "import lib.gemini, lib.media as m\n"
+    "for name in m.BACKEND_MODULES: m.load_backend(name)"
+)
+TIMED = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "{code}\n"
+    "print(time.perf_counter() - start)"
+)
+
+
+def time_import(code: str, runs: int) -> float:
+    """Median seconds the code takes in a fresh interpreter."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', TIMED.format(code=code)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    
+    from lib.media import BACKEND_MODULES, backend_installed
+    installed = [name for name in BACKEND_MODULES if backend_installed(name)]
+    print(f"Installed media backends: {', '.join(installed) or 'none'}")
+    
+    lazy = time_import(LAZY, runs)
+    eager = time_import(EAGER, runs)
+    print(f"import lib.gemini (backends lazy):    {lazy * 1000:8.1f} ms")
+    print(f"import lib.gemini + all backends:     {eager * 1000:8.1f} ms")
+    print(f"Saved at startup: {(eager - lazy) * 1000:.1f} ms (median of {runs} runs)")
+
+
+if __name__ == '__main__':
+    main()
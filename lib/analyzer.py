@@ -8,39 +8,187 @@ import os
 import json
 from datetime import datetime
 from dataclasses import asdict
+from typing import Any, Dict, Optional, Tuple
 
 # Import from our library
-from lib.parser import DiscordHTMLParser
-from lib.gemini import GeminiAnalyzer, ConversationAnalysis
+from lib.parser import create_parser, ConversationIndex
+from lib.filters import filter_from_config
+from lib.cache import MessageCache, ResponseCache, MediaCache
+from lib.journal import RunJournal
+from lib.config import (GEMINI_MAX_CONCURRENCY, GEMINI_REQUESTS_PER_SECOND, GEMINI_MAX_REQUESTS_PER_SECOND,
+                        GEMINI_CHUNK_TOKENS, MEDIA_MAX_WORKERS, MEDIA_SPECTRAL_FEATURES,
+                        MEDIA_VIDEO_SAMPLE_FRAMES, MEDIA_VIDEO_TIME_BUDGET)
+from lib.gemini import GeminiAnalyzer, ConversationAnalysis, ParticipantProfile
 from lib.media import MediaAnalyzer
 
 
 class DiscordAnalyzer:
     """Main class that orchestrates the entire analysis process."""
     
-    def __init__(self, html_file: str, files_directory: str, gemini_api_key: str, model_name: str = 'gemini-1.5-flash'):
-        self.html_file = html_file
+    def __init__(self, export_file: str, files_directory: str, gemini_api_key: Optional[str],
+                 model_name: str = 'gemini-1.5-flash', use_cache: bool = True, use_filter: bool = True,
+                 offline: bool = False):
+        self.export_file = export_file
         self.files_directory = files_directory
         self.gemini_api_key = gemini_api_key
         self.model_name = model_name
+        # Offline runs compute local statistics only and make no API calls
+        self.offline = offline
         
         # Initialize components
-        self.parser = DiscordHTMLParser(html_file)
-        self.media_analyzer = MediaAnalyzer(files_directory)
-        self.gemini_analyzer = GeminiAnalyzer(gemini_api_key, model_name)
+        self.parser = create_parser(export_file)
+        self.message_cache = MessageCache() if use_cache else None
+        self.message_filter = filter_from_config() if use_filter else None
+        self.filter_stats = None
+        self.media_analyzer = MediaAnalyzer(
+            files_directory,
+            cache=MediaCache() if use_cache else None,
+            spectral_features=MEDIA_SPECTRAL_FEATURES,
+            max_workers=MEDIA_MAX_WORKERS,
+            video_sample_frames=MEDIA_VIDEO_SAMPLE_FRAMES,
+            video_time_budget=MEDIA_VIDEO_TIME_BUDGET
+        )
+        self._local_analyzer = None
+        if offline:
+            self.gemini_analyzer = None
+            return
+        self.gemini_analyzer = GeminiAnalyzer(
+            gemini_api_key, model_name,
+            max_concurrency=GEMINI_MAX_CONCURRENCY,
+            requests_per_second=GEMINI_REQUESTS_PER_SECOND,
+            max_requests_per_second=GEMINI_MAX_REQUESTS_PER_SECOND,
+            response_cache=ResponseCache() if use_cache else None,
+            max_chunk_tokens=GEMINI_CHUNK_TOKENS
+        )
         self.gemini_analyzer.set_media_analyzer(self.media_analyzer)
     
-    def analyze(self) -> ConversationAnalysis:
-        """Run the complete analysis pipeline."""
-        print("Parsing Discord HTML export...")
-        messages = self.parser.parse()
-        print(f"Extracted {len(messages)} messages")
+    @property
+    def local_analyzer(self):
+        """LocalAnalyzer for offline runs, created (and pandas imported) when first needed."""
+        if self._local_analyzer is None:
+            from lib.local_analytics import LocalAnalyzer
+            self._local_analyzer = LocalAnalyzer()
+        return self._local_analyzer
+    
+    def analyze(self, profiles_path: Optional[str] = None, resume: bool = False,
+                previous: Optional[Dict[str, Any]] = None) -> ConversationAnalysis:
+        """
+        Run the complete analysis pipeline.
+        
+        If profiles_path is given, participant profiles are streamed there as
+        JSON lines while they complete. Progress is checkpointed to a run
+        journal; with resume=True work finished by an interrupted run is
+        reused instead of repeated. Passing a previous analysis (see
+        find_previous_analysis) only analyzes messages newer than it and
+        merges the results in. Offline analyzers ignore resume and previous.
+        """
+        messages = self._load_messages()
+        if self.message_filter:
+            # Drop bots, notices and noise locally so prompts only carry what people wrote
+            messages = self.message_filter.apply(messages)
+            self.filter_stats = self.message_filter.stats
+            print(self.filter_stats.describe())
+            index = ConversationIndex(messages)
+        else:
+            index = self.parser.get_index()
+        
+        if self.offline:
+            return self._analyze_locally(messages, index, profiles_path)
+        
+        journal = RunJournal.for_export(self.export_file, self.model_name)
+        journal.open(resume=resume)
         
         print("Analyzing conversation with Gemini AI...")
-        analysis = self.gemini_analyzer.analyze_conversation(messages)
+        try:
+            analysis = self.gemini_analyzer.analyze_conversation(
+                messages, index, profiles_path=profiles_path, journal=journal, previous=previous
+            )
+        except BaseException:
+            # Keep the journal on disk so the run can be resumed
+            journal.close()
+            raise
         
+        journal.finish()
         return analysis
     
+    def _analyze_locally(self, messages, index: ConversationIndex,
+                         profiles_path: Optional[str] = None) -> ConversationAnalysis:
+        """Build the analysis from local statistics alone, without any API calls."""
+        print("Computing local statistics (offline, no API calls)...")
+        stats = self.local_analyzer.compute(messages, index)
+        fields = self.local_analyzer.analysis_fields(stats)
+        profiles = {name: ParticipantProfile(**profile) for name, profile in fields['participant_profiles'].items()}
+        
+        if profiles_path:
+            with open(profiles_path, 'a', encoding='utf-8') as f:
+                for profile in profiles.values():
+                    f.write(json.dumps(asdict(profile), ensure_ascii=False) + '\n')
+        
+        return ConversationAnalysis(
+            total_messages=len(messages),
+            participants=index.participants,
+            date_range=index.date_range,
+            sentiment_analysis=fields['sentiment_analysis'],
+            topics=fields['topics'],
+            key_insights=fields['key_insights'],
+            relationship_dynamics=fields['relationship_dynamics'],
+            media_summary=fields['media_summary'],
+            participant_profiles=profiles,
+            local_stats=stats
+        )
+    
+    def has_resumable_run(self) -> bool:
+        """Whether an interrupted run over this export can be resumed."""
+        if self.offline:
+            return False
+        return RunJournal.for_export(self.export_file, self.model_name).exists()
+    
+    def find_previous_analysis(self, search_dir: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Latest analysis_*.json in search_dir made from this export that can be
+        extended incrementally, as (path, analysis), or None.
+        """
+        candidates = sorted(
+            (name for name in os.listdir(search_dir) if name.startswith('analysis_') and name.endswith('.json')),
+            reverse=True
+        )
+        for name in candidates:
+            path = os.path.join(search_dir, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    results = json.load(f)
+            except (OSError, ValueError):
+                continue
+            
+            if os.path.abspath(results.get('source_file', '')) != os.path.abspath(self.export_file):
+                continue
+            analysis = results.get('analysis', {})
+            # Analyses from before incremental support can't be merged into
+            if analysis.get('watermark') and analysis.get('aggregates'):
+                return path, analysis
+        return None
+    
+    def _load_messages(self):
+        """Load parsed messages from the cache, parsing the export on a miss."""
+        if self.message_cache:
+            messages = self.message_cache.load(self.export_file)
+            if messages is not None:
+                self.parser.messages = messages
+                print(f"Loaded {len(messages)} cached messages")
+                return messages
+        
+        print(f"Parsing Discord export: {os.path.basename(self.export_file)}...")
+        messages = self.parser.parse_compact()
+        print(f"Extracted {len(messages)} messages")
+        
+        if self.message_cache:
+            try:
+                self.message_cache.store(self.export_file, messages)
+            except OSError as e:
+                print(f"Warning: could not write message cache: {e}")
+        
+        return messages
+    
     def export_results(self, analysis: ConversationAnalysis, output_file: str):
         """Export analysis results to JSON file."""
         # Convert analysis to dictionary, handling dataclasses
@@ -48,8 +196,9 @@ class DiscordAnalyzer:
         
         results = {
             'analysis_timestamp': datetime.now().isoformat(),
-            'source_file': self.html_file,
+            'source_file': self.export_file,
             'files_directory': self.files_directory,
+            'filter_stats': self.filter_stats.as_dict() if self.filter_stats else None,
             'analysis': analysis_dict
         }
         
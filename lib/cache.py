@@ -0,0 +1,317 @@
+"""
+Analysis Caches
+Stores parsed export messages, Gemini responses and media metadata on disk
+so unchanged inputs are not parsed, sent to the API or analyzed again.
+"""
+
+import os
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from lib.config import EXPORT_DIR
+from lib.parser import ChatMessage, MessageStore, find_export_files
+
+MESSAGE_CACHE_DIR = os.path.join(EXPORT_DIR, '.cache', 'messages')
+DEFAULT_MAX_CACHE_BYTES = 2 * 1024 ** 3
+
+RESPONSE_CACHE_PATH = os.path.join(EXPORT_DIR, '.cache', 'responses.sqlite')
+DEFAULT_RESPONSE_TTL = 30 * 24 * 3600
+DEFAULT_MAX_RESPONSE_BYTES = 256 * 1024 ** 2
+
+MEDIA_CACHE_PATH = os.path.join(EXPORT_DIR, '.cache', 'media.sqlite')
+DEFAULT_MAX_MEDIA_BYTES = 64 * 1024 ** 2
+# Bump when MediaAnalyzer's output changes so stale metadata is not reused
+MEDIA_FORMAT_VERSION = 6
+
+# Bump when the on-disk layout changes; the field list is checked separately
+CACHE_FORMAT_VERSION = 2
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class MessageCache:
+    """
+    On-disk cache of parsed messages keyed by export file fingerprint.
+    
+    Each entry starts with a small pickled header (path, size, mtime and
+    content hash of the export) followed by the pickled columnar
+    MessageStore. A size/mtime match is trusted as-is; if only the mtime
+    moved the content hash is recomputed before the entry is reused.
+    """
+    
+    def __init__(self, cache_dir: str = MESSAGE_CACHE_DIR, max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.field_names = ChatMessage.__slots__
+    
+    def load(self, export_path: str) -> Optional[MessageStore]:
+        """Return cached messages for the export, or None if missing or stale."""
+        entry_path = self._entry_path(export_path)
+        try:
+            with open(entry_path, 'rb') as f:
+                header = pickle.load(f)
+                if not self._header_matches(header, export_path):
+                    return None
+                store = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable message cache entry: {e}")
+            return None
+        
+        # Mark as recently used for eviction
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        
+        return store
+    
+    def store(self, export_path: str, messages: Iterable[ChatMessage]):
+        """Write messages for the export to the cache and enforce the size limit."""
+        size, mtime_ns = stat_signature(export_path)
+        header = {
+            'version': CACHE_FORMAT_VERSION,
+            'fields': self.field_names,
+            'path': os.path.abspath(export_path),
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'content_hash': _content_hash(export_path),
+        }
+        if not isinstance(messages, MessageStore):
+            messages = MessageStore.from_messages(messages)
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_path = self._entry_path(export_path)
+        tmp = entry_path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(messages, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, entry_path)
+        
+        self.evict()
+    
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits max_bytes."""
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return 0
+        
+        entries = []
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        
+        return removed
+    
+    def _entry_path(self, export_path: str) -> str:
+        key = hashlib.sha1(os.path.abspath(export_path).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.bin")
+    
+    def _header_matches(self, header: dict, export_path: str) -> bool:
+        if header.get('version') != CACHE_FORMAT_VERSION or header.get('fields') != self.field_names:
+            return False
+        if header.get('path') != os.path.abspath(export_path):
+            return False
+        
+        try:
+            size, mtime_ns = stat_signature(export_path)
+        except OSError:
+            return False
+        if size != header.get('size'):
+            return False
+        if mtime_ns == header.get('mtime_ns'):
+            return True
+        
+        # Touched but possibly unchanged (e.g. copied or re-synced): compare contents
+        return _content_hash(export_path) == header.get('content_hash')
+
+
+class SQLiteCache:
+    """
+    Thread-safe key/value store in a single SQLite file with TTL expiry and
+    least-recently-used eviction once the stored values exceed max_bytes.
+    """
+    
+    # Check the size limit every this many writes rather than on each one
+    EVICT_EVERY = 32
+    
+    def __init__(self, db_path: str, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+                'created REAL NOT NULL, accessed REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+            self._conn.commit()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored value, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT value, created FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            
+            value, created = row
+            if self.ttl is not None and now - created > self.ttl:
+                self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            
+            self._conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return value
+    
+    def set(self, key: str, value: str):
+        """Store a value, replacing any previous entry for the key."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value), now, now)
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict_locked()
+    
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        with self._lock:
+            return self._evict_locked()
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    
+    def _evict_locked(self) -> int:
+        removed = 0
+        if self.ttl is not None:
+            cursor = self._conn.execute('DELETE FROM entries WHERE created < ?', (time.time() - self.ttl,))
+            removed += cursor.rowcount
+        
+        if self.max_bytes is not None:
+            total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            if total > self.max_bytes:
+                doomed = []
+                for key, size in self._conn.execute('SELECT key, size FROM entries ORDER BY accessed'):
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                self._conn.executemany('DELETE FROM entries WHERE key = ?', doomed)
+                removed += len(doomed)
+        
+        self._conn.commit()
+        return removed
+
+
+class ResponseCache(SQLiteCache):
+    """Content-addressed cache of parsed Gemini responses."""
+    
+    def __init__(self, db_path: str = RESPONSE_CACHE_PATH, ttl: Optional[float] = DEFAULT_RESPONSE_TTL,
+                 max_bytes: Optional[int] = DEFAULT_MAX_RESPONSE_BYTES):
+        super().__init__(db_path, ttl=ttl, max_bytes=max_bytes)
+    
+    @staticmethod
+    def make_key(model_name: str, temperature: float, prompt: str) -> str:
+        """Hash of everything that determines the response."""
+        digest = hashlib.sha256()
+        digest.update(f"{model_name}\0{temperature!r}\0".encode('utf-8'))
+        digest.update(prompt.encode('utf-8'))
+        return digest.hexdigest()
+
+
+class MediaCache(SQLiteCache):
+    """
+    Media file metadata keyed by file path, size, mtime and analysis options,
+    and by content hash so identical files share one entry.
+    """
+    
+    def __init__(self, db_path: str = MEDIA_CACHE_PATH, max_bytes: Optional[int] = DEFAULT_MAX_MEDIA_BYTES):
+        super().__init__(db_path, ttl=None, max_bytes=max_bytes)
+    
+    @staticmethod
+    def make_key(path: str, size: int, mtime_ns: int, options: dict) -> str:
+        """Hash of the file's identity and everything that changes its analysis."""
+        digest = hashlib.sha256()
+        digest.update(f"{MEDIA_FORMAT_VERSION}\0{path}\0{size}\0{mtime_ns}\0".encode('utf-8'))
+        digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+    
+    @staticmethod
+    def make_content_key(content_hash: str, options: dict) -> str:
+        """Hash of the file's contents and everything that changes its analysis, shared by all copies."""
+        digest = hashlib.sha256()
+        digest.update(f"{MEDIA_FORMAT_VERSION}\0content\0{content_hash}\0".encode('utf-8'))
+        digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+
+def _export_files(export_path: str) -> List[str]:
+    """Files that make up an export: the file itself, or a directory's channel files."""
+    if os.path.isdir(export_path):
+        return find_export_files(export_path, recursive=False)
+    return [export_path]
+
+
+def stat_signature(export_path: str) -> Tuple[int, int]:
+    """Total size and latest mtime (ns) of the export's files."""
+    size = 0
+    mtime_ns = 0
+    for path in _export_files(export_path):
+        st = os.stat(path)
+        size += st.st_size
+        mtime_ns = max(mtime_ns, st.st_mtime_ns)
+    return size, mtime_ns
+
+
+def _content_hash(export_path: str) -> str:
+    """BLAKE2 hash over the contents (and names) of the export's files."""
+    digest = hashlib.blake2b(digest_size=20)
+    for path in _export_files(export_path):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(HASH_BLOCK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+    return digest.hexdigest()
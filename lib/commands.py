@@ -342,6 +342,7 @@ def cmd_analyze(_):
     import os
     from pathlib import Path
     from lib.analyzer import DiscordAnalyzer
+    from lib.parser import find_export_files
     from lib.visualizer import create_visualizations
     
     # Check if exports directory exists and has files
@@ -349,21 +350,27 @@ def cmd_analyze(_):
         print("❌ No exports found. Please export some data first.")
         return
     
-    # List available export files
-    export_files = []
-    for root, dirs, files in os.walk(EXPORT_DIR):
-        for file in files:
-            if file.endswith('.html'):
-                export_files.append(os.path.join(root, file))
+    # List available export files, plus whole guild directories
+    export_files = find_export_files(EXPORT_DIR)
     
     if not export_files:
-        print("❌ No HTML export files found. Please export in HTML format to enable analysis.")
+        print("❌ No HTML or JSON export files found. Please export in HTML or JSON format to enable analysis.")
         return
     
-    print("\n=== Available HTML Exports ===")
+    guild_dirs = sorted(set(
+        os.path.dirname(path) for path in export_files
+        if os.path.basename(os.path.dirname(path)).startswith('guild_')
+    ))
+    export_files = guild_dirs + export_files
+    
+    print("\n=== Available Exports ===")
     for idx, file_path in enumerate(export_files, 1):
         rel_path = os.path.relpath(file_path, EXPORT_DIR)
-        print(f"{idx}. {rel_path}")
+        if os.path.isdir(file_path):
+            channel_count = len(find_export_files(file_path, recursive=False))
+            print(f"{idx}. {rel_path}/ (entire guild, {channel_count} channels)")
+        else:
+            print(f"{idx}. {rel_path}")
     
     # Select file to analyze
     selection = input(f"\nSelect file to analyze (1-{len(export_files)}): ").strip()
@@ -378,18 +385,22 @@ def cmd_analyze(_):
         return
     
     # Get files directory (look for a files/ subdirectory or use EXPORT_DIR)
-    html_dir = os.path.dirname(selected_file)
-    files_dir = os.path.join(html_dir, 'files')
+    export_dir = selected_file if os.path.isdir(selected_file) else os.path.dirname(selected_file)
+    files_dir = os.path.join(export_dir, 'files')
     if not os.path.exists(files_dir):
-        files_dir = html_dir
+        files_dir = export_dir
+    
+    # Offline runs only compute local statistics and need no API key
+    offline = input("\nRun offline (local statistics only, no API calls)? (y/N): ").strip().lower() == 'y'
     
     # Check for Gemini API key
-    gemini_api_key = os.environ.get('GEMINI_API_KEY')
-    if not gemini_api_key:
-        gemini_api_key = input("\nEnter your Google Gemini API key (or set GEMINI_API_KEY env var): ").strip()
+    gemini_api_key = None if offline else os.environ.get('GEMINI_API_KEY')
+    if not offline and not gemini_api_key:
+        gemini_api_key = input("\nEnter your Google Gemini API key (or set GEMINI_API_KEY env var, "
+                               "leave empty to run offline): ").strip()
         if not gemini_api_key:
-            print("❌ API key is required for analysis.")
-            return
+            print("No API key given, running offline with local statistics only.")
+            offline = True
     
     # Ask about visualizations
     create_viz = input("\nGenerate visualizations? (y/N): ").strip().lower() == 'y'
@@ -401,17 +412,35 @@ def cmd_analyze(_):
         
         # Initialize analyzer
         analyzer = DiscordAnalyzer(
-            html_file=selected_file,
+            export_file=selected_file,
             files_directory=files_dir,
             gemini_api_key=gemini_api_key,
-            model_name='gemini-1.5-flash'
+            model_name='gemini-1.5-flash',
+            offline=offline
         )
         
-        # Run analysis
-        analysis = analyzer.analyze()
+        # Offer to pick up an interrupted run where it stopped
+        resume = False
+        if analyzer.has_resumable_run():
+            resume = input("\nAn interrupted analysis of this export was found. Resume it? (Y/n): ").strip().lower() != 'n'
+        
+        # Offer to only analyze messages added since the last analysis of this export
+        previous = None
+        found = None if offline else analyzer.find_previous_analysis(EXPORT_DIR)
+        if found:
+            previous_file, previous_analysis = found
+            answer = input(f"\nAn earlier analysis of this export was found ({os.path.basename(previous_file)}). "
+                           "Only analyze new messages and merge them into it? (Y/n): ").strip().lower()
+            if answer != 'n':
+                previous = previous_analysis
+        
+        # Run analysis, streaming profiles to disk as they finish
+        run_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        profiles_file = os.path.join(EXPORT_DIR, f"profiles_{run_stamp}.jsonl")
+        analysis = analyzer.analyze(profiles_path=profiles_file, resume=resume, previous=previous)
         
         # Export results
-        output_file = os.path.join(EXPORT_DIR, f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        output_file = os.path.join(EXPORT_DIR, f"analysis_{run_stamp}.json")
         analyzer.export_results(analysis, output_file)
         
         # Print summary
@@ -475,6 +504,7 @@ def cmd_analyze(_):
         
     except KeyboardInterrupt:
         print("\n❌ Analysis interrupted by user")
+        print("💾 Completed work was saved; analyze the same export again to resume.")
     except Exception as e:
         print(f"❌ Error during analysis: {e}")
         import traceback
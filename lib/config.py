@@ -10,6 +10,33 @@ EXPORT_DIR = "exports"
 
 ROOT = os.environ.get("ROOT", "https://discord.com/api/")
 
+
+def _positive_float(name, default):
+    value = float(os.environ.get(name, default))
+    if value <= 0:
+        raise ValueError(f"{name} must be greater than 0, got {value}")
+    return value
+
+
+# Gemini request concurrency, starting request rate and the ceiling it may adapt up to
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_REQUESTS_PER_SECOND = _positive_float("GEMINI_REQUESTS_PER_SECOND", "1.0")
+GEMINI_MAX_REQUESTS_PER_SECOND = _positive_float("GEMINI_MAX_REQUESTS_PER_SECOND", "10.0")
+# Target size of the conversation text sent per analysis request, in tokens
+GEMINI_CHUNK_TOKENS = int(os.environ.get("GEMINI_CHUNK_TOKENS", "60000"))
+
+# Local message pre-filter run before analysis; ID lists are comma separated
+ANALYSIS_FILTER = os.environ.get("ANALYSIS_FILTER", "1").lower() not in ("0", "false", "no")
+ANALYSIS_BOT_IDS = [i.strip() for i in os.environ.get("ANALYSIS_BOT_IDS", "").split(",") if i.strip()]
+ANALYSIS_ALLOWED_AUTHOR_IDS = [i.strip() for i in os.environ.get("ANALYSIS_ALLOWED_AUTHOR_IDS", "").split(",") if i.strip()]
+
+# Media analysis worker processes (empty for one per CPU) and opt-in audio spectral features
+MEDIA_MAX_WORKERS = int(os.environ["MEDIA_MAX_WORKERS"]) if os.environ.get("MEDIA_MAX_WORKERS") else None
+MEDIA_SPECTRAL_FEATURES = os.environ.get("MEDIA_SPECTRAL_FEATURES", "0").lower() in ("1", "true", "yes")
+# Frames sampled per video for visual features (0 to only read container headers) and the time allowed per video
+MEDIA_VIDEO_SAMPLE_FRAMES = int(os.environ.get("MEDIA_VIDEO_SAMPLE_FRAMES", "0"))
+MEDIA_VIDEO_TIME_BUDGET = float(os.environ.get("MEDIA_VIDEO_TIME_BUDGET", "5.0"))
+
 DISCORD_AUTHZ = f"{ROOT}oauth2/authorize"
 DISCORD_TOKEN = f"{ROOT}oauth2/token"
 DISCORD_ME    = f"{ROOT}users/@me"
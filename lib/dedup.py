@@ -0,0 +1,159 @@
+"""
+Media Deduplication
+Content hashes find exact copies of an attachment; perceptual hashes
+(aHash/dHash) find re-encoded, resized or recompressed copies of an image.
+"""
+
+import hashlib
+from typing import Any, Dict, List
+
+import numpy as np
+
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+# Images whose dHashes differ in at most this many of 64 bits are near-duplicates
+NEAR_DUPLICATE_DISTANCE = 6
+# 64-bit hashes are split into this many bands for candidate lookup; two
+# hashes within NEAR_DUPLICATE_DISTANCE bits always share at least one band
+HASH_BANDS = 8
+MAX_REPORTED_CLUSTERS = 20
+MAX_CLUSTER_FILES = 10
+
+
+def content_hash(file_path: str) -> str:
+    """BLAKE2 hash of a file's bytes."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def perceptual_hashes(image) -> Dict[str, str]:
+    """aHash and dHash of a PIL image, as 16-digit hex strings."""
+    gray = image.convert('L')
+    small = np.asarray(gray.resize((8, 8)), dtype=np.float32)
+    wide = np.asarray(gray.resize((9, 8)), dtype=np.float32)
+    return {
+        'ahash': _pack_bits(small > small.mean()),
+        'dhash': _pack_bits(wide[:, 1:] > wide[:, :-1])
+    }
+
+
+def _pack_bits(bits: np.ndarray) -> str:
+    return np.packbits(bits.ravel()).tobytes().hex()
+
+
+def hamming_distances(hashes: np.ndarray, other: np.ndarray) -> np.ndarray:
+    """Bitwise Hamming distances between paired uint64 hashes."""
+    xor = np.ascontiguousarray(hashes ^ other)
+    if hasattr(np, 'bitwise_count'):  # NumPy 2.0+
+        return np.bitwise_count(xor)
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def near_duplicate_pairs(hashes: np.ndarray, max_distance: int = NEAR_DUPLICATE_DISTANCE) -> np.ndarray:
+    """
+    Index pairs (i < j) of distinct uint64 hashes within max_distance bits.
+    
+    Only hashes sharing a band are compared, so this stays far below the
+    quadratic all-pairs cost. It finds every pair as long as max_distance
+    is below HASH_BANDS.
+    """
+    band_bits = 64 // HASH_BANDS
+    found = []
+    for band in range(HASH_BANDS):
+        keys = (hashes >> np.uint64(band * band_bits)) & np.uint64((1 << band_bits) - 1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts, ends):
+            if end - start < 2:
+                continue
+            members = order[start:end]
+            first, second = np.triu_indices(len(members), k=1)
+            left, right = members[first], members[second]
+            close = hamming_distances(hashes[left], hashes[right]) <= max_distance
+            if close.any():
+                found.append(np.stack([np.minimum(left, right)[close], np.maximum(left, right)[close]], axis=1))
+    
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(found), axis=0)
+
+
+def duplicate_clusters(analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Exact and near-duplicate clusters among media analyses.
+    
+    Analyses with the same content_hash are copies of one file; images whose
+    dHashes are within NEAR_DUPLICATE_DISTANCE are grouped as near-duplicates.
+    The largest clusters are listed, each with up to MAX_CLUSTER_FILES names.
+    """
+    by_content: Dict[str, List[str]] = {}
+    dhash_by_content: Dict[str, str] = {}
+    for analysis in analyses:
+        digest = analysis.get('content_hash')
+        if not digest:
+            continue
+        by_content.setdefault(digest, []).append(analysis.get('filename', ''))
+        if analysis.get('dhash'):
+            dhash_by_content[digest] = analysis['dhash']
+    
+    # Group distinct contents whose images look alike
+    contents = list(dhash_by_content)
+    parent = list(range(len(contents)))
+    
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    if len(contents) > 1:
+        hashes = np.array([int(dhash_by_content[c], 16) for c in contents], dtype=np.uint64)
+        distinct, inverse = np.unique(hashes, return_inverse=True)
+        # Contents with identical dHashes, then those with nearby ones
+        representative = {}
+        for i, code in enumerate(inverse.tolist()):
+            if code in representative:
+                parent[find(i)] = find(representative[code])
+            else:
+                representative[code] = i
+        for a, b in near_duplicate_pairs(distinct):
+            parent[find(representative[int(a)])] = find(representative[int(b)])
+    
+    groups: Dict[int, List[str]] = {}
+    for i, digest in enumerate(contents):
+        groups.setdefault(find(i), []).append(digest)
+    near_contents = {digest: members for members in groups.values() if len(members) > 1 for digest in members}
+    
+    clusters = []
+    seen = set()
+    for digest in by_content:
+        if digest in seen:
+            continue
+        members = near_contents.get(digest, [digest])
+        seen.update(members)
+        references = [name for member in members for name in by_content[member]]
+        if len(references) < 2:
+            continue
+        clusters.append({
+            'kind': 'near' if len(members) > 1 else 'exact',
+            'references': len(references),
+            'distinct_files': len(members),
+            'files': references[:MAX_CLUSTER_FILES]
+        })
+    
+    clusters.sort(key=lambda cluster: cluster['references'], reverse=True)
+    total = sum(len(files) for files in by_content.values())
+    return {
+        'unique_files': len(by_content),
+        'duplicate_references': total - len(by_content),
+        'exact_clusters': sum(1 for cluster in clusters if cluster['kind'] == 'exact'),
+        'near_duplicate_clusters': sum(1 for cluster in clusters if cluster['kind'] == 'near'),
+        'clusters': clusters[:MAX_REPORTED_CLUSTERS]
+    }
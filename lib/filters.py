@@ -0,0 +1,165 @@
+"""
+Message Pre-filtering
+Drops and folds messages that carry no information for the AI analysis
+before any prompt is built.
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterable, Optional
+
+from lib.config import ANALYSIS_FILTER, ANALYSIS_BOT_IDS, ANALYSIS_ALLOWED_AUTHOR_IDS
+from lib.parser import ChatMessage, MessageStore, Reaction
+
+# Identical messages from one author this close together are folded into one
+DEFAULT_REPEAT_WINDOW_MS = 60 * 60 * 1000
+
+
+@dataclass
+class FilterStats:
+    """What a MessageFilter run kept and removed."""
+    input_messages: int = 0
+    kept_messages: int = 0
+    bot_messages: int = 0
+    system_messages: int = 0
+    empty_messages: int = 0
+    collapsed_attachment_messages: int = 0
+    folded_repeats: int = 0
+    
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    def describe(self) -> str:
+        removed = self.input_messages - self.kept_messages
+        return (f"Kept {self.kept_messages} of {self.input_messages} messages ({removed} removed: "
+                f"{self.bot_messages} from bots, {self.system_messages} system notices, "
+                f"{self.empty_messages} empty, {self.collapsed_attachment_messages} merged into "
+                f"attachment runs, {self.folded_repeats} repeats)")
+
+
+class MessageFilter:
+    """
+    Local pre-filter between the parser and the Gemini analysis.
+    
+    Removes messages from bots (flagged by the export or listed in bot_ids,
+    unless their author ID is in allowed_author_ids), Discord system
+    notices and messages with neither text nor attachments. Consecutive
+    attachment-only messages from one author become a single message holding
+    all the attachments, and a text-only message an author repeats verbatim
+    within repeat_window_ms is kept once. Replies to a merged or folded
+    message are pointed at the message kept in its place. Message text is
+    never altered.
+    """
+    
+    def __init__(self, drop_bots: bool = True, bot_ids: Iterable[str] = (),
+                 allowed_author_ids: Iterable[str] = (), drop_system: bool = True,
+                 drop_empty: bool = True, collapse_attachments: bool = True,
+                 fold_repeats: bool = True, repeat_window_ms: int = DEFAULT_REPEAT_WINDOW_MS):
+        self.drop_bots = drop_bots
+        self.bot_ids = set(bot_ids)
+        self.allowed_author_ids = set(allowed_author_ids)
+        self.drop_system = drop_system
+        self.drop_empty = drop_empty
+        self.collapse_attachments = collapse_attachments
+        self.fold_repeats = fold_repeats
+        self.repeat_window_ms = repeat_window_ms
+        self.stats = FilterStats()
+    
+    def apply(self, messages: Iterable[ChatMessage]) -> MessageStore:
+        """Filter messages (in time order) into a new store; counts end up in self.stats."""
+        stats = FilterStats()
+        result = MessageStore()
+        bot_ids = set(self.bot_ids)
+        last_by_author = {}
+        # IDs of merged and folded messages -> ID of the message kept in their place
+        kept_ids = {}
+        pending = None
+        
+        for msg in messages:
+            stats.input_messages += 1
+            
+            # The export marks bots per message; remember them by ID so every
+            # message of that account is dropped
+            if msg.is_bot and msg.author_id:
+                bot_ids.add(msg.author_id)
+            if self.drop_bots and (msg.is_bot or msg.author_id in bot_ids) \
+                    and msg.author_id not in self.allowed_author_ids:
+                stats.bot_messages += 1
+                continue
+            if self.drop_system and msg.is_system:
+                stats.system_messages += 1
+                continue
+            
+            has_text = bool(msg.content.strip())
+            if not has_text and not msg.attachments:
+                if self.drop_empty:
+                    stats.empty_messages += 1
+                    continue
+            
+            if msg.reply_to in kept_ids:
+                msg = _with_reply_to(msg, kept_ids[msg.reply_to])
+            
+            if self.fold_repeats and has_text:
+                previous = last_by_author.get(msg.author_id or msg.author)
+                # Only plain text is folded; attachments and reply links would be lost
+                if previous and previous[0] == msg.content and not msg.attachments and not msg.reply_to \
+                        and 0 <= msg.timestamp_ms - previous[1] <= self.repeat_window_ms:
+                    kept_ids[msg.message_id] = previous[2]
+                    stats.folded_repeats += 1
+                    continue
+                last_by_author[msg.author_id or msg.author] = (msg.content, msg.timestamp_ms, msg.message_id)
+            
+            if self.collapse_attachments and not has_text and msg.attachments:
+                if pending is not None and not pending.content.strip() and pending.attachments \
+                        and pending.author_id == msg.author_id and pending.author == msg.author \
+                        and msg.reply_to in (None, pending.reply_to):
+                    pending = _merge_attachment_messages(pending, msg)
+                    kept_ids[msg.message_id] = pending.message_id
+                    stats.collapsed_attachment_messages += 1
+                    continue
+            
+            if pending is not None:
+                result.append(pending)
+            pending = msg
+        
+        if pending is not None:
+            result.append(pending)
+        
+        stats.kept_messages = len(result)
+        self.stats = stats
+        return result
+
+
+def _merge_attachment_messages(first: ChatMessage, other: ChatMessage) -> ChatMessage:
+    """One attachment-only message holding the attachments and reactions of both."""
+    reaction_counts = {}
+    for reaction in first.reactions + other.reactions:
+        reaction_counts[reaction.emoji] = reaction_counts.get(reaction.emoji, 0) + reaction.count
+    return ChatMessage(
+        message_id=first.message_id,
+        author=first.author,
+        author_id=first.author_id,
+        timestamp=first.timestamp,
+        content=first.content,
+        attachments=first.attachments + other.attachments,
+        reactions=[Reaction(emoji, count) for emoji, count in reaction_counts.items()],
+        reply_to=first.reply_to,
+        edited=first.edited,
+        edited_timestamp=first.edited_timestamp,
+        timestamp_ms=first.timestamp_ms,
+        is_bot=first.is_bot,
+        is_system=first.is_system
+    )
+
+
+def _with_reply_to(msg: ChatMessage, reply_to: str) -> ChatMessage:
+    """Copy of a message replying to another message, leaving the original untouched."""
+    copy = ChatMessage(*msg.astuple())
+    copy.reply_to = reply_to
+    return copy
+
+
+def filter_from_config() -> Optional[MessageFilter]:
+    """MessageFilter configured from the environment, or None when filtering is turned off."""
+    if not ANALYSIS_FILTER:
+        return None
+    return MessageFilter(bot_ids=ANALYSIS_BOT_IDS, allowed_author_ids=ANALYSIS_ALLOWED_AUTHOR_IDS)
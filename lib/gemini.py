@@ -3,10 +3,15 @@ Gemini AI Analyzer
 Uses Google Gemini AI to analyze chat content and media.
 """
 
+import json
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
-from .wrapper import GeminiWrapper
+from dataclasses import dataclass, field, asdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .wrapper import GeminiWrapper, AdaptiveRateLimiter, DEFAULT_CHUNK_TOKENS
+from .cache import ResponseCache
+from .journal import RunJournal
 from .media import MediaAnalyzer
+from .parser import ConversationIndex, format_timestamp
 
 
 @dataclass
@@ -37,233 +42,630 @@ class ConversationAnalysis:
     relationship_dynamics: Dict[str, Any]
     media_summary: Dict[str, Any]
     participant_profiles: Dict[str, ParticipantProfile]
+    aggregates: Dict[str, Any] = field(default_factory=dict)
+    watermark: Dict[str, Any] = field(default_factory=dict)
+    summary: Dict[str, Any] = field(default_factory=dict)
+    local_stats: Dict[str, Any] = field(default_factory=dict)
+    failed_chunks: List[Dict[str, Any]] = field(default_factory=list)
 
 
 class GeminiAnalyzer:
     """Uses Google Gemini AI to analyze chat content and media."""
     
-    def __init__(self, api_key: str, model_name: str = 'gemini-1.5-pro'):
+    # Participants whose message text is at most this long share profile
+    # requests, up to PROFILE_BATCH_SIZE people or PROFILE_BATCH_CHARS of text
+    SMALL_PROFILE_CHARS = 6000
+    PROFILE_BATCH_CHARS = 48000
+    PROFILE_BATCH_SIZE = 12
+    
+    # Each merge request in the summary tree takes at most SUMMARY_FAN_IN
+    # analyses or SUMMARY_BATCH_CHARS of JSON, whichever is reached first
+    SUMMARY_FAN_IN = 8
+    SUMMARY_BATCH_CHARS = 40000
+    
+    def __init__(self, api_key: str, model_name: str = 'gemini-1.5-pro',
+                 max_concurrency: int = 4, requests_per_second: float = 1.0,
+                 max_requests_per_second: Optional[float] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 max_chunk_tokens: int = DEFAULT_CHUNK_TOKENS):
         self.api_key = api_key
-        self.gemini = GeminiWrapper(api_key, model_name)
+        self.max_concurrency = max(1, max_concurrency)
+        # Starts at requests_per_second and adapts to the API's throttling feedback
+        self.rate_limiter = AdaptiveRateLimiter(rate=requests_per_second, burst=self.max_concurrency,
+                                                max_rate=max_requests_per_second)
+        self.gemini = GeminiWrapper(api_key, model_name, rate_limiter=self.rate_limiter,
+                                    response_cache=response_cache, max_chunk_tokens=max_chunk_tokens)
         self.media_analyzer = None
+        self._local_analyzer = None
+    
+    @property
+    def local_analyzer(self):
+        """Local statistics engine, imported on first use since pandas is slow to import."""
+        if self._local_analyzer is None:
+            from .local_analytics import LocalAnalyzer
+            self._local_analyzer = LocalAnalyzer()
+        return self._local_analyzer
     
     def set_media_analyzer(self, media_analyzer: MediaAnalyzer):
         """Set the media analyzer for file analysis."""
         self.media_analyzer = media_analyzer
     
-    def analyze_conversation(self, messages: List[Any]) -> ConversationAnalysis:
-        """Analyze the entire conversation using Gemini with chunking for large conversations."""
-        print(f"Analyzing {len(messages)} messages...")
-        
-        # Extract basic info first
-        participants = list(set(msg.author for msg in messages))
-        timestamps = [msg.timestamp for msg in messages if msg.timestamp]
-        date_range = (min(timestamps), max(timestamps)) if timestamps else ('', '')
-        
-        # Analyze media attachments
-        media_summary = self._analyze_media_attachments(messages)
+    def analyze_conversation(self, messages: List[Any], index: Optional[ConversationIndex] = None,
+                             profiles_path: Optional[str] = None,
+                             journal: Optional[RunJournal] = None,
+                             previous: Optional[Dict[str, Any]] = None) -> ConversationAnalysis:
+        """
+        Analyze the entire conversation using Gemini with chunking for large conversations.
         
-        # Chunk messages for analysis (max 2000 messages per chunk)
-        chunk_size = 2000
-        message_chunks = [messages[i:i + chunk_size] for i in range(0, len(messages), chunk_size)]
+        When a journal is given, every finished chunk, the media summary and
+        each profile are checkpointed to it, and work it already holds is skipped.
         
-        print(f"Processing {len(message_chunks)} chunks of messages...")
+        previous is an earlier analysis of the same conversation (as exported
+        to JSON). Only messages past its watermark are analyzed; their results
+        are merged into it and only participants with new messages get their
+        profile updated.
+        """
+        # Local statistics are recomputed over the whole conversation, which
+        # takes seconds, rather than merged like the chunk analyses
+        all_messages, all_index = messages, index
+        if previous:
+            messages = self._messages_after(messages, previous.get('watermark') or {})
+            print(f"Found {len(messages)} new messages since the previous analysis")
+            if not messages:
+                return self._restore_analysis(previous)
+            index = None
         
-        # Analyze each chunk
-        chunk_analyses = []
-        for i, chunk in enumerate(message_chunks):
-            print(f"Analyzing chunk {i+1}/{len(message_chunks)} ({len(chunk)} messages)...")
-            chunk_analysis = self._analyze_message_chunk(chunk, i+1, len(message_chunks))
-            if chunk_analysis:
-                chunk_analyses.append(chunk_analysis)
-        
-        # Combine chunk analyses
-        if chunk_analyses:
-            combined_analysis = self._combine_chunk_analyses(chunk_analyses, messages)
-        else:
-            print("No successful chunk analyses, creating fallback analysis...")
-            combined_analysis = self._create_fallback_analysis(messages)
+        print(f"Analyzing {len(messages)} messages...")
         
-        # Generate participant profiles
-        print("Generating detailed participant profiles...")
-        participant_profiles = self._generate_participant_profiles(messages, combined_analysis, participants)
+        # Extract basic info first from the shared index
+        if index is None:
+            index = ConversationIndex(messages)
+        participants = index.participants
+        date_range = index.date_range
+        
+        # Measured statistics seed the profile prompts and stand in for failed requests
+        local_stats = self.local_analyzer.compute(all_messages, all_index if previous else index)
+        local_fields = self.local_analyzer.analysis_fields(local_stats)
+        
+        # Chunk messages to fill the prompt budget, cutting at pauses in the conversation
+        message_chunks = self.gemini.plan_chunks(messages)
+        
+        print(f"Processing {len(message_chunks)} chunks of messages "
+              f"(up to {self.gemini.chunk_token_budget()} tokens each)...")
+        
+        # Media analysis (local work) and the summary tree (which only waits on
+        # requests it queues) run on their own threads alongside the API
+        # requests instead of delaying them or taking a worker slot
+        media_pool = ThreadPoolExecutor(max_workers=2)
+        pool = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            if journal and journal.media_summary is not None:
+                media_future = None
+            else:
+                media_future = media_pool.submit(self._analyze_media_attachments, messages)
+            
+            # Analyze chunks concurrently, keeping results in chunk order
+            chunk_results = self._analyze_chunks(pool, message_chunks, journal)
+            chunk_analyses = [result for result in chunk_results if result]
+            failed_chunks = self._failed_chunk_ranges(message_chunks, chunk_results)
+            # Chunks after the first failure are analyzed again by the next
+            # incremental run, so only the ones before it are stored as done
+            covered = failed_chunks[0]['chunk'] - 1 if failed_chunks else len(message_chunks)
+            
+            # Combine chunk analyses, folding them into the previous results if any
+            previous_aggregates = previous.get('aggregates') if previous else None
+            if chunk_analyses or previous_aggregates:
+                combined_analysis = self._combine_chunk_analyses(chunk_analyses, messages, previous_aggregates)
+                if failed_chunks:
+                    aggregates = self._aggregate_chunk_analyses(
+                        chunk_results[:covered], sum(len(chunk) for chunk in message_chunks[:covered])
+                    )
+                    if previous_aggregates:
+                        aggregates = self._merge_aggregates(previous_aggregates, aggregates)
+                    combined_analysis['aggregates'] = aggregates
+            else:
+                print("No successful chunk analyses, creating fallback analysis...")
+                combined_analysis = self._create_fallback_analysis(local_fields)
+            
+            # Summarize long conversations by merging chunk results level by level
+            summary_future = None
+            previous_summary = previous.get('summary') if previous else None
+            if len(chunk_analyses) + bool(previous_summary) > 1:
+                total_messages = len(messages) + (previous.get('total_messages', 0) if previous else 0)
+                summary_future = media_pool.submit(self._summarize_tree, pool, chunk_analyses,
+                                                   total_messages, previous_summary)
+            
+            # Generate participant profiles as soon as the combined context is ready
+            print("Generating detailed participant profiles...")
+            previous_profiles = previous.get('participant_profiles', {}) if previous else {}
+            participant_profiles = self._generate_participant_profiles(pool, index, combined_analysis, profiles_path,
+                                                                       journal, previous_profiles, local_stats,
+                                                                       local_fields['participant_profiles'])
+            
+            if media_future is None:
+                media_summary = journal.media_summary
+            else:
+                media_summary = media_future.result()
+                if journal:
+                    journal.record_media(media_summary)
+            
+            summary = summary_future.result() if summary_future else {}
+            if not summary and previous_summary:
+                summary = previous_summary
+        except BaseException:
+            # Don't let Ctrl-C wait for every queued request to run first
+            pool.shutdown(wait=False, cancel_futures=True)
+            media_pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+        media_pool.shutdown()
         
         # Print API usage statistics
         stats = self.gemini.get_stats()
-        print(f"API Usage: {stats['total_requests']} requests made to {stats['model_name']}")
+        print(f"API Usage: {stats['total_requests']} requests made to {stats['model_name']} "
+              f"({stats['cache_hits']} cached responses reused, {stats['cache_misses']} cache misses)")
+        
+        if failed_chunks:
+            print(f"{len(failed_chunks)} of {len(message_chunks)} chunks failed; the next incremental run "
+                  f"analyzes again from {failed_chunks[0]['start']}")
+        
+        previous_watermark = (previous.get('watermark') or {}) if previous else {}
+        watermark = self._advance_watermark(messages, index, message_chunks, covered, previous_watermark) or previous_watermark
+        
+        total_messages = len(messages)
+        if previous:
+            # Messages past the previous watermark were counted then and are part of this run too
+            total_messages += previous_watermark.get('message_count', previous.get('total_messages', 0))
+            participants = list(dict.fromkeys(previous.get('participants', []) + participants))
+            previous_range = previous.get('date_range') or (None, None)
+            date_range = (previous_range[0] or date_range[0], date_range[1])
+            media_summary = self._merge_media_summaries(previous.get('media_summary', {}), media_summary,
+                                                        previous_watermark)
+            participant_profiles = {
+                name: participant_profiles.get(name) or ParticipantProfile(**previous_profiles[name])
+                for name in participants if name in participant_profiles or name in previous_profiles
+            }
         
         return ConversationAnalysis(
-            total_messages=len(messages),
+            total_messages=total_messages,
             participants=participants,
             date_range=date_range,
             sentiment_analysis=combined_analysis.get('sentiment_analysis', {}),
             topics=combined_analysis.get('topics', []),
             key_insights=combined_analysis.get('key_insights', []),
-            relationship_dynamics=combined_analysis.get('relationship_dynamics', {}),
+            relationship_dynamics=self._summarized_dynamics(combined_analysis.get('relationship_dynamics', {}), summary),
             media_summary=media_summary,
-            participant_profiles=participant_profiles
+            participant_profiles=participant_profiles,
+            aggregates=combined_analysis.get('aggregates', {}),
+            watermark=watermark,
+            summary=summary,
+            local_stats=local_stats,
+            failed_chunks=failed_chunks
         )
     
-    def _analyze_message_chunk(self, messages: List[Any], chunk_num: int, total_chunks: int) -> Optional[Dict]:
-        """Analyze a chunk of messages using the Gemini wrapper."""
-        # Convert ChatMessage objects to dictionaries for the wrapper
-        message_dicts = []
-        for msg in messages:
-            message_dicts.append({
-                'timestamp': msg.timestamp,
-                'author': msg.author,
-                'content': msg.content,
-                'attachments': msg.attachments,
-                'reactions': msg.reactions
+    def _summarize_tree(self, pool: ThreadPoolExecutor, chunk_analyses: List[Dict], total_messages: int,
+                        previous_summary: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Summarize the conversation by merging chunk analyses as a tree.
+        
+        Each level groups neighbouring analyses into bounded batches and
+        merges the batches concurrently on the worker pool, so the number of
+        levels grows with the logarithm of the chunk count and no prompt has
+        to hold every chunk. The final level goes to summarize_analysis.
+        """
+        items = [self._summary_leaf(analysis) for analysis in chunk_analyses]
+        if previous_summary:
+            # An earlier run's summary stands in for everything before the watermark
+            items.insert(0, {
+                'summary': previous_summary.get('executive_summary', ''),
+                'topics': previous_summary.get('key_themes', []),
+                'key_events': previous_summary.get('notable_events', []),
+                'key_insights': previous_summary.get('recommendations', [])
             })
         
-        # Use the wrapper to analyze the chunk
-        return self.gemini.analyze_conversation_chunk(message_dicts, chunk_num, total_chunks)
+        level = 0
+        while True:
+            batches = self._plan_summary_batches(items)
+            if len(batches) == 1:
+                break
+            level += 1
+            print(f"Summary level {level}: merging {len(items)} analyses in {len(batches)} requests...")
+            futures = [pool.submit(self.gemini.merge_chunk_analyses, batch, level) for batch in batches]
+            merged = []
+            for batch, future in zip(batches, futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Summary merge failed: {e}")
+                    result = None
+                # Keep the batch's content in a bounded form rather than losing it
+                merged.append(self._summary_leaf(result) if isinstance(result, dict)
+                              else self._merge_summary_items_locally(batch))
+            items = merged
+        
+        print(f"Summarizing conversation from {len(items)} analyses...")
+        summary = self.gemini.summarize_analysis(items, total_messages)
+        return summary if isinstance(summary, dict) else {}
     
-    def _combine_chunk_analyses(self, chunk_analyses: List[Dict], all_messages: List[Any]) -> Dict:
-        """Combine multiple chunk analyses into a comprehensive analysis."""
-        print("Combining chunk analyses...")
-        print(f"Number of chunk analyses: {len(chunk_analyses)}")
+    def _plan_summary_batches(self, items: List[Dict]) -> List[List[Dict]]:
+        """Group consecutive items into batches bounded by count and JSON size (at least two per batch)."""
+        batches = []
+        batch = []
+        batch_chars = 0
+        for item in items:
+            chars = len(json.dumps(item, ensure_ascii=False))
+            if len(batch) >= 2 and (batch_chars + chars > self.SUMMARY_BATCH_CHARS or len(batch) >= self.SUMMARY_FAN_IN):
+                batches.append(batch)
+                batch = []
+                batch_chars = 0
+            batch.append(item)
+            batch_chars += chars
+        if batch:
+            batches.append(batch)
+        return batches
+    
+    def _summary_leaf(self, analysis: Dict) -> Dict[str, Any]:
+        """The parts of a (chunk or merged) analysis that feed the summary tree, size-bounded."""
+        sentiment = analysis.get('sentiment_analysis', {})
+        if not isinstance(sentiment, dict):
+            sentiment = {}
+        leaf = {
+            'summary': analysis.get('summary', ''),
+            'sentiment_analysis': {
+                'overall_sentiment': sentiment.get('overall_sentiment', 'unknown'),
+                'emotional_tone': sentiment.get('emotional_tone', ''),
+                'emotional_highlights': list(sentiment.get('emotional_highlights', []) or [])[:10]
+            },
+            'topics': list(analysis.get('topics', []) or [])[:15],
+            'key_events': list(analysis.get('key_events', []) or [])[:10],
+            'relationship_dynamics': analysis.get('relationship_dynamics', {}),
+            'key_insights': list(analysis.get('key_insights', []) or [])[:10]
+        }
+        return {key: value for key, value in leaf.items() if value}
+    
+    def _merge_summary_items_locally(self, items: List[Dict]) -> Dict[str, Any]:
+        """Fallback for a failed merge request: concatenate the items' lists, trimmed."""
+        merged = {'topics': [], 'key_events': [], 'key_insights': []}
+        for item in items:
+            for key in merged:
+                merged[key].extend(item.get(key, []))
+        merged = {key: list(dict.fromkeys(values))[:15] for key, values in merged.items()}
+        merged['summary'] = ' '.join(item.get('summary', '') for item in items if item.get('summary'))[:2000]
+        return merged
+    
+    def _summarized_dynamics(self, dynamics: Dict[str, Any], summary: Dict[str, Any]) -> Dict[str, Any]:
+        """Prefer the summary's whole-conversation descriptions over the per-chunk string joins."""
+        if not summary:
+            return dynamics
+        dynamics = dict(dynamics)
+        for key, summary_key in (('communication_style', 'communication_patterns'),
+                                 ('relationship_overview', 'relationship_overview'),
+                                 ('relationship_health', 'relationship_health')):
+            if summary.get(summary_key):
+                dynamics[key] = summary[summary_key]
+        return dynamics
+    
+    def _advance_watermark(self, messages: List[Any], index: ConversationIndex, message_chunks: List[List[Any]],
+                           covered: int, previous: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Identify the newest message of the first covered chunks, which were
+        analyzed without a gap, so a later run can pick up after it. Also
+        counts the messages analyzed up to it across runs. Empty if no chunk
+        is covered.
+        """
+        if covered == len(message_chunks):
+            if not index.time_order:
+                return {}
+            last = messages[index.time_order[-1]]
+            count = len(messages)
+        elif covered:
+            covered_messages = [msg for chunk in message_chunks[:covered] for msg in chunk]
+            last = max(covered_messages, key=lambda msg: msg.timestamp_ms)
+            count = len(covered_messages)
+        else:
+            return {}
+        if previous:
+            count += previous.get('message_count', 0)
+        return {'message_id': last.message_id, 'timestamp_ms': last.timestamp_ms, 'message_count': count}
+    
+    def _failed_chunk_ranges(self, message_chunks: List[List[Any]], chunk_results: List[Optional[Dict]]) -> List[Dict]:
+        """The messages each chunk without an analysis spans."""
+        return [
+            {
+                'chunk': i + 1,
+                'messages': len(chunk),
+                'first_message_id': chunk[0].message_id,
+                'last_message_id': chunk[-1].message_id,
+                'start': format_timestamp(chunk[0].timestamp_ms),
+                'end': format_timestamp(chunk[-1].timestamp_ms)
+            }
+            for i, (chunk, result) in enumerate(zip(message_chunks, chunk_results)) if not result
+        ]
+    
+    def _is_after(self, message_id: str, timestamp_ms: int, watermark: Dict[str, Any]) -> bool:
+        """Whether a message is newer than the watermark, by snowflake id where possible, else by time."""
+        last_id = str(watermark.get('message_id', ''))
+        if last_id.isdigit() and message_id.isdigit():
+            # Snowflakes grow monotonically, so they order messages exactly
+            return int(message_id) > int(last_id)
+        return timestamp_ms > watermark.get('timestamp_ms', 0)
+    
+    def _messages_after(self, messages: List[Any], watermark: Dict[str, Any]) -> List[Any]:
+        """Messages newer than the watermark."""
+        return [msg for msg in messages if self._is_after(msg.message_id, msg.timestamp_ms, watermark)]
+    
+    def _restore_analysis(self, previous: Dict[str, Any]) -> ConversationAnalysis:
+        """Rebuild a ConversationAnalysis from its exported JSON."""
+        return ConversationAnalysis(
+            total_messages=previous.get('total_messages', 0),
+            participants=previous.get('participants', []),
+            date_range=tuple(previous.get('date_range') or (None, None)),
+            sentiment_analysis=previous.get('sentiment_analysis', {}),
+            topics=previous.get('topics', []),
+            key_insights=previous.get('key_insights', []),
+            relationship_dynamics=previous.get('relationship_dynamics', {}),
+            media_summary=previous.get('media_summary', {}),
+            participant_profiles={
+                name: ParticipantProfile(**profile)
+                for name, profile in previous.get('participant_profiles', {}).items()
+            },
+            aggregates=previous.get('aggregates', {}),
+            watermark=previous.get('watermark', {}),
+            summary=previous.get('summary', {}),
+            local_stats=previous.get('local_stats', {}),
+            failed_chunks=previous.get('failed_chunks', [])
+        )
+    
+    def _merge_media_summaries(self, previous: Dict[str, Any], current: Dict[str, Any],
+                               watermark: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add the media found in new messages to an earlier media summary.
         
-        # Debug: Check types of chunk analyses
-        for i, analysis in enumerate(chunk_analyses):
-            print(f"Chunk {i+1} type: {type(analysis)}")
-            if isinstance(analysis, dict):
-                print(f"Chunk {i+1} keys: {list(analysis.keys())}")
-            else:
-                print(f"Chunk {i+1} content: {str(analysis)[:200]}...")
+        Files the earlier summary took from messages past its watermark are
+        dropped, as those messages were analyzed again in this run.
+        """
+        if 'error' in previous:
+            return current
+        if 'error' in current:
+            return previous
+        
+        files = [
+            media for media in previous.get('files', [])
+            if not self._is_after(str(media.get('message_id', '')), media.get('timestamp_ms', 0), watermark)
+        ]
+        return self._summarize_media(files + current.get('files', []))
+    
+    def _analyze_chunks(self, pool: ThreadPoolExecutor, message_chunks: List[List[Any]],
+                        journal: Optional[RunJournal] = None) -> List[Optional[Dict]]:
+        """Analyze all chunks on the worker pool and return their results in chunk order (None where one failed)."""
+        total = len(message_chunks)
+        results = [None] * total
+        chunk_keys = [self._chunk_key(chunk) for chunk in message_chunks]
+        futures = {}
+        for i, chunk in enumerate(message_chunks):
+            if journal:
+                results[i] = journal.get_chunk(i, chunk_keys[i])
+                if results[i]:
+                    continue
+            print(f"Queued chunk {i+1}/{total} ({len(chunk)} messages)")
+            futures[pool.submit(self._analyze_message_chunk, chunk, i+1, total)] = i
+        
+        if len(futures) < total:
+            print(f"Reusing {total - len(futures)} chunk analyses from the previous run")
+        
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                print(f"Chunk {i+1}/{total} failed: {e}")
+                continue
+            status = "done" if results[i] else "failed"
+            print(f"[{done}/{len(futures)}] Chunk {i+1} {status}")
+            if results[i] and journal:
+                journal.record_chunk(i, chunk_keys[i], results[i])
         
-        # Combine all topics
-        all_topics = []
-        for analysis in chunk_analyses:
-            if isinstance(analysis, dict):
-                topics = analysis.get('topics', [])
-                if isinstance(topics, list):
-                    all_topics.extend(topics)
+        return results
+    
+    def _chunk_key(self, chunk: List[Any]) -> str:
+        """Identifies the messages a chunk covers, so checkpoints survive only if chunking matches."""
+        return f"{chunk[0].message_id}:{chunk[-1].message_id}:{len(chunk)}"
+    
+    def _analyze_message_chunk(self, messages: List[Any], chunk_num: int, total_chunks: int) -> Optional[Dict]:
+        """Analyze a chunk of messages using the Gemini wrapper."""
+        # The wrapper reads ChatMessage attributes directly, no per-message dicts needed
+        return self.gemini.analyze_conversation_chunk(messages, chunk_num, total_chunks)
+    
+    def _combine_chunk_analyses(self, chunk_analyses: List[Dict], all_messages: List[Any],
+                                previous: Optional[Dict[str, Any]] = None) -> Dict:
+        """
+        Combine multiple chunk analyses into a comprehensive analysis.
         
-        # Get unique topics and count frequency
-        topic_counts = {}
-        for topic in all_topics:
-            topic_counts[topic] = topic_counts.get(topic, 0) + 1
+        previous holds the stored aggregates of an earlier analysis; when
+        given, the new chunks are merged into it so an incremental run only
+        needs to analyze the newly exported messages.
+        """
+        print("Combining chunk analyses...")
+        print(f"Number of chunk analyses: {len(chunk_analyses)}")
         
-        # Sort by frequency and take top topics
-        sorted_topics = sorted(topic_counts.items(), key=lambda x: x[1], reverse=True)
-        main_topics = [topic for topic, count in sorted_topics[:15]]
+        aggregates = self._aggregate_chunk_analyses(chunk_analyses, len(all_messages))
+        if previous:
+            aggregates = self._merge_aggregates(previous, aggregates)
         
-        # Combine sentiment analysis
-        sentiment_scores = {'positive': 0, 'negative': 0, 'neutral': 0, 'mixed': 0}
-        participant_sentiments = {}
-        emotional_highlights = []
+        return self._build_combined_analysis(aggregates)
+    
+    def _aggregate_chunk_analyses(self, chunk_analyses: List[Dict], message_count: int) -> Dict[str, Any]:
+        """Reduce chunk analyses to mergeable counts and lists."""
+        aggregates = {
+            'chunk_count': 0,
+            'message_count': message_count,
+            'topic_counts': {},
+            'sentiment_breakdown': {'positive': 0, 'negative': 0, 'neutral': 0, 'mixed': 0},
+            'participant_sentiment_counts': {},
+            'emotional_highlights': [],
+            'key_insights': [],
+            'communication_styles': [],
+            'power_dynamics': [],
+            'intimacy_levels': []
+        }
         
         for analysis in chunk_analyses:
             if not isinstance(analysis, dict):
                 print(f"Warning: Skipping non-dict analysis: {type(analysis)}")
                 continue
-                
+            aggregates['chunk_count'] += 1
+            
+            # Count topic frequency
+            topics = analysis.get('topics', [])
+            if isinstance(topics, list):
+                for topic in topics:
+                    aggregates['topic_counts'][topic] = aggregates['topic_counts'].get(topic, 0) + 1
+            
+            insights = analysis.get('key_insights', [])
+            if isinstance(insights, list):
+                aggregates['key_insights'].extend(insights)
+            
+            rd = analysis.get('relationship_dynamics', {})
+            if isinstance(rd, dict):
+                if rd.get('interaction_patterns'):
+                    aggregates['communication_styles'].append(rd['interaction_patterns'])
+                if rd.get('power_dynamics'):
+                    aggregates['power_dynamics'].append(rd['power_dynamics'])
+                if rd.get('intimacy_level'):
+                    aggregates['intimacy_levels'].append(rd['intimacy_level'])
+            
             sentiment = analysis.get('sentiment_analysis', {})
             if not isinstance(sentiment, dict):
                 print(f"Warning: sentiment_analysis is not a dict: {type(sentiment)}")
                 continue
-                
+            
             overall = sentiment.get('overall_sentiment', 'neutral')
-            if overall in sentiment_scores:
-                sentiment_scores[overall] += 1
+            if overall in aggregates['sentiment_breakdown']:
+                aggregates['sentiment_breakdown'][overall] += 1
             
-            # Combine participant sentiments
+            # Count participant sentiments, extracting the main sentiment from detailed descriptions
             participant_sentiment_data = sentiment.get('sentiment_by_participant', {})
             if isinstance(participant_sentiment_data, dict):
                 for participant, sentiment_value in participant_sentiment_data.items():
-                    if participant not in participant_sentiments:
-                        participant_sentiments[participant] = []
-                    participant_sentiments[participant].append(sentiment_value)
+                    main_sentiment = 'neutral'
+                    if 'positive' in str(sentiment_value).lower():
+                        main_sentiment = 'positive'
+                    elif 'negative' in str(sentiment_value).lower():
+                        main_sentiment = 'negative'
+                    counts = aggregates['participant_sentiment_counts'].setdefault(participant, {})
+                    counts[main_sentiment] = counts.get(main_sentiment, 0) + 1
             
-            # Collect emotional highlights
             highlights = sentiment.get('emotional_highlights', [])
             if isinstance(highlights, list):
-                emotional_highlights.extend(highlights)
+                aggregates['emotional_highlights'].extend(highlights)
+        
+        return self._trim_aggregates(aggregates)
+    
+    def _merge_aggregates(self, previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge the aggregates of an earlier analysis with those of newly analyzed chunks."""
+        merged = {
+            'chunk_count': previous.get('chunk_count', 0) + current['chunk_count'],
+            'message_count': previous.get('message_count', 0) + current['message_count'],
+            'topic_counts': dict(previous.get('topic_counts', {})),
+            'sentiment_breakdown': dict(previous.get('sentiment_breakdown', {})),
+            'participant_sentiment_counts': {
+                participant: dict(counts)
+                for participant, counts in previous.get('participant_sentiment_counts', {}).items()
+            }
+        }
+        
+        for topic, count in current['topic_counts'].items():
+            merged['topic_counts'][topic] = merged['topic_counts'].get(topic, 0) + count
+        for sentiment, count in current['sentiment_breakdown'].items():
+            merged['sentiment_breakdown'][sentiment] = merged['sentiment_breakdown'].get(sentiment, 0) + count
+        for participant, counts in current['participant_sentiment_counts'].items():
+            merged_counts = merged['participant_sentiment_counts'].setdefault(participant, {})
+            for sentiment, count in counts.items():
+                merged_counts[sentiment] = merged_counts.get(sentiment, 0) + count
+        
+        # Newer observations first so they survive trimming
+        for key in ('emotional_highlights', 'key_insights', 'communication_styles', 'power_dynamics', 'intimacy_levels'):
+            merged[key] = current[key] + previous.get(key, [])
+        
+        return self._trim_aggregates(merged)
+    
+    def _trim_aggregates(self, aggregates: Dict[str, Any]) -> Dict[str, Any]:
+        """De-duplicate the text lists (keeping order) and bound their size for storage."""
+        for key, limit in (('emotional_highlights', 50), ('key_insights', 100), ('communication_styles', 50),
+                           ('power_dynamics', 50), ('intimacy_levels', 50)):
+            aggregates[key] = list(dict.fromkeys(item for item in aggregates[key] if isinstance(item, str)))[:limit]
+        return aggregates
+    
+    def _build_combined_analysis(self, aggregates: Dict[str, Any]) -> Dict:
+        """Derive the combined analysis from (possibly merged) aggregates."""
+        # Sort by frequency and take top topics
+        sorted_topics = sorted(aggregates['topic_counts'].items(), key=lambda x: x[1], reverse=True)
+        main_topics = [topic for topic, count in sorted_topics[:15]]
         
         # Determine overall sentiment
+        sentiment_scores = aggregates['sentiment_breakdown']
         overall_sentiment = max(sentiment_scores, key=sentiment_scores.get)
         
-        # Average participant sentiments
-        avg_participant_sentiments = {}
-        for participant, sentiments in participant_sentiments.items():
-            # Simple majority vote for participant sentiment
-            sentiment_counts = {}
-            for sentiment in sentiments:
-                # Extract main sentiment from detailed descriptions
-                main_sentiment = 'neutral'
-                if 'positive' in sentiment.lower():
-                    main_sentiment = 'positive'
-                elif 'negative' in sentiment.lower():
-                    main_sentiment = 'negative'
-                sentiment_counts[main_sentiment] = sentiment_counts.get(main_sentiment, 0) + 1
-            avg_participant_sentiments[participant] = max(sentiment_counts, key=sentiment_counts.get)
-        
-        # Combine relationship dynamics
-        all_insights = []
-        communication_styles = []
-        power_dynamics = []
-        intimacy_levels = []
+        # Simple majority vote for participant sentiment
+        avg_participant_sentiments = {
+            participant: max(counts, key=counts.get)
+            for participant, counts in aggregates['participant_sentiment_counts'].items() if counts
+        }
         
-        for analysis in chunk_analyses:
-            if not isinstance(analysis, dict):
-                continue
-                
-            insights = analysis.get('key_insights', [])
-            if isinstance(insights, list):
-                all_insights.extend(insights)
-            
-            rd = analysis.get('relationship_dynamics', {})
-            if isinstance(rd, dict):
-                if rd.get('interaction_patterns'):
-                    communication_styles.append(rd['interaction_patterns'])
-                if rd.get('power_dynamics'):
-                    power_dynamics.append(rd['power_dynamics'])
-                if rd.get('intimacy_level'):
-                    intimacy_levels.append(rd['intimacy_level'])
+        chunk_count = aggregates['chunk_count']
         
         # Create comprehensive analysis
-        combined_analysis = {
+        return {
             'sentiment_analysis': {
                 'overall_sentiment': overall_sentiment,
                 'sentiment_breakdown': sentiment_scores,
                 'sentiment_by_participant': avg_participant_sentiments,
-                'emotional_highlights': emotional_highlights[:10],  # Top 10 highlights
+                'emotional_highlights': aggregates['emotional_highlights'][:10],  # Top 10 highlights
                 'emotional_tone': f"Mixed emotional journey with {overall_sentiment} overall tone"
             },
             'topics': main_topics,
-            'key_insights': list(set(all_insights))[:20],  # Unique insights, top 20
+            'key_insights': aggregates['key_insights'][:20],  # Unique insights, top 20
             'relationship_dynamics': {
-                'communication_style': '; '.join(set(communication_styles))[:500],
-                'power_dynamics': '; '.join(set(power_dynamics))[:500],
-                'intimacy_level': '; '.join(set(intimacy_levels))[:500],
-                'interaction_patterns': f"Analyzed {len(chunk_analyses)} conversation segments",
+                'communication_style': '; '.join(aggregates['communication_styles'])[:500],
+                'power_dynamics': '; '.join(aggregates['power_dynamics'])[:500],
+                'intimacy_level': '; '.join(aggregates['intimacy_levels'])[:500],
+                'interaction_patterns': f"Analyzed {chunk_count} conversation segments",
                 'conflict_patterns': "Patterns observed across multiple conversation segments"
             },
             'conversation_flow': {
-                'structure': f"Multi-segment conversation with {len(chunk_analyses)} distinct phases",
-                'engagement_level': "high" if len(all_messages) > 1000 else "medium",
+                'structure': f"Multi-segment conversation with {chunk_count} distinct phases",
+                'engagement_level': "high" if aggregates['message_count'] > 1000 else "medium",
                 'response_patterns': "Complex interaction patterns across extended conversation"
-            }
+            },
+            'aggregates': aggregates
         }
-        
-        return combined_analysis
     
     def _analyze_media_attachments(self, messages: List[Any]) -> Dict[str, Any]:
         """Analyze media attachments in the conversation."""
         if not self.media_analyzer:
             return {'error': 'Media analyzer not configured'}
         
-        media_files = []
+        file_paths = []
+        sources = []
         for msg in messages:
             for attachment in msg.attachments:
                 if attachment.startswith('files/'):
                     file_path = self.media_analyzer.files_directory / attachment
                     if file_path.exists():
-                        analysis = self.media_analyzer.analyze_file(str(file_path))
-                        media_files.append(analysis)
-        
+                        file_paths.append(str(file_path))
+                        sources.append(msg)
+        
+        # Cached metadata is reused, each distinct file is analyzed once on a
+        # process pool and copies share its result
+        media_files = [
+            # Remember the message, so incremental runs can tell which run a file belongs to
+            dict(media, message_id=msg.message_id, timestamp_ms=msg.timestamp_ms)
+            for media, msg in zip(self.media_analyzer.analyze_files(file_paths), sources)
+        ]
+        return self._summarize_media(media_files)
+    
+    def _summarize_media(self, media_files: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Counts by type and duplicate clusters of analyzed media files."""
         # Categorize media
         media_types = {}
         for media in media_files:
@@ -275,91 +677,275 @@ class GeminiAnalyzer:
         return {
             'total_files': len(media_files),
             'by_type': {k: len(v) for k, v in media_types.items()},
+            'duplicates': self.media_analyzer.find_duplicates(media_files),
             'files': media_files
         }
     
-    def _create_fallback_analysis(self, messages: List[Any]) -> Dict:
-        """Create a basic analysis when Gemini fails."""
-        participants = list(set(msg.author for msg in messages))
-        timestamps = [msg.timestamp for msg in messages if msg.timestamp]
-        date_range = (min(timestamps), max(timestamps)) if timestamps else ('', '')
-        
+    def _create_fallback_analysis(self, local_fields: Dict[str, Any]) -> Dict:
+        """Create the analysis from local statistics when Gemini fails."""
         return {
-            'sentiment_analysis': {
-                'overall_sentiment': 'unknown',
-                'error': 'Analysis failed'
-            },
-            'topics': [],
-            'key_insights': ['Analysis could not be completed due to API error'],
-            'relationship_dynamics': {},
-            'media_summary': {'error': 'Media analysis not available'}
+            'sentiment_analysis': local_fields['sentiment_analysis'],
+            'topics': local_fields['topics'],
+            'key_insights': ['AI analysis could not be completed due to API error; '
+                             'results are local statistics'] + local_fields['key_insights'],
+            'relationship_dynamics': local_fields['relationship_dynamics'],
+            'media_summary': local_fields['media_summary']
         }
     
-    def _generate_participant_profiles(self, messages: List[Any], combined_analysis: Dict, participants: List[str]) -> Dict[str, ParticipantProfile]:
-        """Generate detailed profiles for each participant."""
-        profiles = {}
-        
-        for participant in participants:
-            print(f"Creating profile for {participant}...")
+    def _generate_participant_profiles(self, pool: ThreadPoolExecutor, index: ConversationIndex, combined_analysis: Dict,
+                                       profiles_path: Optional[str] = None,
+                                       journal: Optional[RunJournal] = None,
+                                       previous_profiles: Optional[Dict[str, Dict]] = None,
+                                       local_stats: Optional[Dict[str, Any]] = None,
+                                       local_profiles: Optional[Dict[str, Dict]] = None) -> Dict[str, ParticipantProfile]:
+        """
+        Generate detailed profiles for each participant on the worker pool.
+        
+        Each profile is appended to profiles_path (JSON lines) as soon as it
+        completes, so finished profiles survive a crash later in the run.
+        A participant's previous profile, if given, is updated rather than
+        rebuilt from scratch. Prompts include each participant's measured
+        activity from local_stats, and a failed request falls back to the
+        participant's local profile.
+        """
+        context = dict(combined_analysis, local_stats=local_stats or {})
+        completed = {}
+        if journal:
+            for participant, profile in journal.profiles.items():
+                completed[participant] = ParticipantProfile(**profile)
+            if completed:
+                print(f"Reusing {len(completed)} participant profiles from the previous run")
+        
+        futures = {}
+        small = []
+        for participant in index.participants:
+            if participant in completed:
+                continue
             
-            # Filter messages for this participant
-            participant_messages = [msg for msg in messages if msg.author == participant]
+            # Look up this participant's messages from the author postings
+            participant_messages = index.messages_by(participant)
             
             if not participant_messages:
                 continue
             
-            # Generate profile using Gemini
-            profile_data = self._analyze_participant_profile(participant, participant_messages, combined_analysis)
+            previous_profile = (previous_profiles or {}).get(participant)
+            # Built once here and reused for batching and for the prompt
+            participant_text = self._prepare_participant_messages(participant, participant_messages)
+            job = (participant, participant_messages, previous_profile, participant_text)
             
-            if profile_data:
-                profiles[participant] = ParticipantProfile(
-                    name=participant,
-                    personality_traits=profile_data.get('personality_traits', []),
-                    communication_style=profile_data.get('communication_style', 'Unknown'),
-                    likes=profile_data.get('likes', []),
-                    dislikes=profile_data.get('dislikes', []),
-                    interests=profile_data.get('interests', []),
-                    important_ideas=profile_data.get('important_ideas', []),
-                    emotional_patterns=profile_data.get('emotional_patterns', []),
-                    role_in_conversation=profile_data.get('role_in_conversation', 'Participant'),
-                    activity_level=profile_data.get('activity_level', 'Medium'),
-                    influence_level=profile_data.get('influence_level', 'Medium')
-                )
-            else:
-                # Fallback profile
-                profiles[participant] = ParticipantProfile(
-                    name=participant,
-                    personality_traits=['Unable to analyze'],
-                    communication_style='Unknown',
-                    likes=[],
-                    dislikes=[],
-                    interests=[],
-                    important_ideas=[],
-                    emotional_patterns=[],
-                    role_in_conversation='Participant',
-                    activity_level='Unknown',
-                    influence_level='Unknown'
-                )
-        
-        return profiles
-    
-    def _analyze_participant_profile(self, participant: str, messages: List[Any], context: Dict) -> Optional[Dict]:
+            # Quiet participants are batched together; busy ones keep their own request
+            if len(participant_text) <= self.SMALL_PROFILE_CHARS:
+                small.append(job)
+                continue
+            
+            print(f"Queued profile for {participant}...")
+            futures[pool.submit(self._analyze_participant_batch, [job], context)] = [participant]
+        
+        for batch in self._plan_profile_batches(small):
+            names = [participant for participant, *_ in batch]
+            print(f"Queued profiles for {', '.join(names)}...")
+            futures[pool.submit(self._analyze_participant_batch, batch, context)] = names
+        
+        total = sum(len(names) for names in futures.values())
+        print(f"Requesting {total} participant profiles in {len(futures)} requests")
+        
+        done = 0
+        sink = open(profiles_path, 'a', encoding='utf-8') if profiles_path else None
+        try:
+            for future in as_completed(futures):
+                names = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"Profiles for {', '.join(names)} failed: {e}")
+                    results = {}
+                
+                for participant in names:
+                    profile_data = results.get(participant)
+                    profile = self._build_participant_profile(participant, profile_data,
+                                                              (local_profiles or {}).get(participant))
+                    completed[participant] = profile
+                    done += 1
+                    print(f"[{done}/{total}] Profile for {participant} {'done' if profile_data else 'failed'}")
+                    
+                    if sink:
+                        sink.write(json.dumps(asdict(profile), ensure_ascii=False) + '\n')
+                        sink.flush()
+                    if journal and profile_data:
+                        journal.record_profile(participant, asdict(profile))
+        finally:
+            if sink:
+                sink.close()
+        
+        # Keep profiles in participant order regardless of completion order
+        return {name: completed[name] for name in index.participants if name in completed}
+    
+    def _plan_profile_batches(self, jobs: List[tuple]) -> List[List[tuple]]:
+        """Group small profile jobs into batches bounded by prompt size and participant count."""
+        batches = []
+        batch = []
+        batch_chars = 0
+        for job in jobs:
+            chars = len(job[3])
+            if batch and (batch_chars + chars > self.PROFILE_BATCH_CHARS or len(batch) >= self.PROFILE_BATCH_SIZE):
+                batches.append(batch)
+                batch = []
+                batch_chars = 0
+            batch.append(job)
+            batch_chars += chars
+        if batch:
+            batches.append(batch)
+        return batches
+    
+    def _analyze_participant_batch(self, batch: List[tuple], context: Dict) -> Dict[str, Optional[Dict]]:
+        """
+        Profile a batch of participants with one request, keyed by participant.
+        
+        A batch of one uses the single-participant prompt. Participants that
+        a multi-profile response leaves out are retried on their own.
+        """
+        if len(batch) == 1:
+            participant, messages, previous_profile, participant_text = batch[0]
+            profile_data = self._analyze_participant_profile(participant, messages, context, previous_profile,
+                                                             participant_text)
+            return {participant: profile_data if isinstance(profile_data, dict) else None}
+        
+        overall_sentiment = context.get('sentiment_analysis', {}).get('overall_sentiment', 'unknown')
+        main_topics = context.get('topics', [])[:10]  # Top 10 topics
+        
+        sections = []
+        for participant, messages, previous_profile, participant_text in batch:
+            section = f"""
+        === Participant: {participant} ({len(messages)} messages) ===
+        Measured activity: {self._measured_activity(participant, context)}
+"""
+            if previous_profile:
+                section += f"""        Profile from earlier messages (update it, keeping whatever still holds):
+        {json.dumps(previous_profile, ensure_ascii=False)}
+"""
+            section += f"""        Messages:
+        {participant_text}
+"""
+            sections.append(section)
+        
+        names = [participant for participant, *_ in batch]
+        prompt = f"""
+        Analyze the profiles of several participants in a Discord conversation,
+        each based on their own messages below.
+
+        Overall conversation sentiment: {overall_sentiment}
+        Main conversation topics: {', '.join(main_topics)}
+{''.join(sections)}
+        For every participant, analyze their personality traits, communication
+        style, likes/interests, dislikes, important ideas, emotional patterns,
+        role in the conversation, and activity & influence.
+
+        Provide the analysis in JSON format, with one entry per participant keyed
+        by the exact participant name ({', '.join(json.dumps(name, ensure_ascii=False) for name in names)}):
+        {{
+            "profiles": {{
+                "participant name": {{
+                    "personality_traits": ["trait 1", "trait 2", "trait 3"],
+                    "communication_style": "description of how they communicate",
+                    "likes": ["specific thing they like 1", "specific thing they like 2"],
+                    "dislikes": ["specific thing they dislike 1"],
+                    "interests": ["interest/hobby 1", "interest/hobby 2"],
+                    "important_ideas": ["key idea/belief 1", "key idea/belief 2"],
+                    "emotional_patterns": ["emotional pattern 1"],
+                    "role_in_conversation": "their role (e.g., leader, supporter, questioner, entertainer)",
+                    "activity_level": "high/medium/low - based on message frequency and engagement",
+                    "influence_level": "high/medium/low - based on how others respond to them"
+                }}
+            }}
+        }}
+        """
+        
+        response = self.gemini.generate_content(prompt)
+        profiles = response.get('profiles', response) if isinstance(response, dict) else response
+        if isinstance(profiles, list):
+            # JSON mode sometimes returns a list of profiles that each name their participant
+            profiles = {
+                item.get('name') or item.get('participant'): item
+                for item in profiles if isinstance(item, dict)
+            }
+        if not isinstance(profiles, dict):
+            print(f"Batched profiles came back as {type(profiles).__name__}, requesting them separately")
+            profiles = {}
+        
+        results = {}
+        for participant, messages, previous_profile, participant_text in batch:
+            profile_data = profiles.get(participant)
+            if not isinstance(profile_data, dict):
+                print(f"Batched profile for {participant} missing, requesting it separately")
+                profile_data = self._analyze_participant_profile(participant, messages, context, previous_profile,
+                                                                 participant_text)
+            results[participant] = profile_data if isinstance(profile_data, dict) else None
+        return results
+    
+    def _build_participant_profile(self, participant: str, profile_data: Optional[Dict],
+                                   local_profile: Optional[Dict] = None) -> ParticipantProfile:
+        """Turn Gemini's profile JSON into a ParticipantProfile, or a fallback if it failed."""
+        if profile_data:
+            return ParticipantProfile(
+                name=participant,
+                personality_traits=profile_data.get('personality_traits', []),
+                communication_style=profile_data.get('communication_style', 'Unknown'),
+                likes=profile_data.get('likes', []),
+                dislikes=profile_data.get('dislikes', []),
+                interests=profile_data.get('interests', []),
+                important_ideas=profile_data.get('important_ideas', []),
+                emotional_patterns=profile_data.get('emotional_patterns', []),
+                role_in_conversation=profile_data.get('role_in_conversation', 'Participant'),
+                activity_level=profile_data.get('activity_level', 'Medium'),
+                influence_level=profile_data.get('influence_level', 'Medium')
+            )
+        
+        # Fallback profile, from local statistics when there are any
+        if local_profile:
+            return ParticipantProfile(**local_profile)
+        return ParticipantProfile(
+            name=participant,
+            personality_traits=['Unable to analyze'],
+            communication_style='Unknown',
+            likes=[],
+            dislikes=[],
+            interests=[],
+            important_ideas=[],
+            emotional_patterns=[],
+            role_in_conversation='Participant',
+            activity_level='Unknown',
+            influence_level='Unknown'
+        )
+    
+    def _analyze_participant_profile(self, participant: str, messages: List[Any], context: Dict,
+                                     previous_profile: Optional[Dict] = None,
+                                     participant_text: Optional[str] = None) -> Optional[Dict]:
         """Use Gemini to analyze a specific participant's profile."""
-        # Prepare participant's message history
-        participant_text = self._prepare_participant_messages(participant, messages)
+        # Prepare participant's message history unless the caller already has it
+        if participant_text is None:
+            participant_text = self._prepare_participant_messages(participant, messages)
         
         # Extract context from combined analysis
         overall_sentiment = context.get('sentiment_analysis', {}).get('overall_sentiment', 'unknown')
         main_topics = context.get('topics', [])[:10]  # Top 10 topics
         
+        previous_text = ""
+        if previous_profile:
+            previous_text = f"""
+        Profile from this participant's earlier messages (update it with the new
+        messages below, keeping whatever still holds):
+        {json.dumps(previous_profile, ensure_ascii=False)}
+"""
+        
         prompt = f"""
         Analyze this participant's profile based on their messages in a Discord conversation.
 
         Participant: {participant}
         Number of messages: {len(messages)}
+        Measured activity: {self._measured_activity(participant, context)}
         Overall conversation sentiment: {overall_sentiment}
         Main conversation topics: {', '.join(main_topics)}
-
+{previous_text}
         Participant's messages:
         {participant_text}
 
@@ -391,15 +977,16 @@ class GeminiAnalyzer:
         
         return self.gemini.generate_content(prompt)
     
+    def _measured_activity(self, participant: str, context: Dict) -> str:
+        """The participant's activity as measured locally, for the profile prompts."""
+        return self.local_analyzer.describe_participant(participant, context.get('local_stats') or {}) or 'unknown'
+    
     def _prepare_participant_messages(self, participant: str, messages: List[Any]) -> str:
         """Prepare a participant's messages for analysis."""
         message_lines = []
         
         for msg in messages[:200]:  # Limit to last 200 messages for analysis
-            # Extract time from timestamp
-            timestamp = msg.timestamp or 'Unknown time'
-            if ' ' in timestamp:
-                timestamp = timestamp.split(' ')[-1]
+            timestamp = format_timestamp(msg.timestamp_ms)
             
             # Prepare content
             content = msg.content.strip() if msg.content else "[No text content]"
@@ -422,7 +1009,7 @@ class GeminiAnalyzer:
             
             # Add reaction info
             if msg.reactions:
-                reaction_emojis = [r.get('emoji', '') for r in msg.reactions[:3]]
+                reaction_emojis = [r.emoji for r in msg.reactions[:3]]
                 line += f" [Reactions: {', '.join(reaction_emojis)}]"
             
             message_lines.append(line)
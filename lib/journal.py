@@ -0,0 +1,138 @@
+"""
+Analysis Run Journal
+Checkpoints completed analysis work so an interrupted run can resume.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+from lib.config import EXPORT_DIR
+from lib.cache import stat_signature
+
+JOURNAL_DIR = os.path.join(EXPORT_DIR, '.runs')
+
+
+class RunJournal:
+    """
+    Append-only JSON lines log of one analysis run over an export.
+    
+    The first line records the export's size/mtime; every later line is a
+    finished unit of work (a chunk analysis, the media summary or a
+    participant profile). On resume the completed units are loaded back and
+    skipped. A journal whose export has changed since is discarded.
+    """
+    
+    def __init__(self, path: str, export_path: str):
+        self.path = path
+        self.export_path = export_path
+        self.chunks = {}
+        self.media_summary = None
+        self.profiles = {}
+        self._file = None
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def for_export(cls, export_path: str, model_name: str, journal_dir: str = JOURNAL_DIR) -> 'RunJournal':
+        """Journal location for analyzing an export with a given model."""
+        key = hashlib.sha1(f"{os.path.abspath(export_path)}\0{model_name}".encode('utf-8')).hexdigest()
+        return cls(os.path.join(journal_dir, f"{key}.jsonl"), export_path)
+    
+    def exists(self) -> bool:
+        """Whether an unfinished run for this export is on disk."""
+        return os.path.exists(self.path)
+    
+    def open(self, resume: bool = False):
+        """Start journaling, loading previous progress first when resuming."""
+        signature = list(stat_signature(self.export_path))
+        
+        if resume and self._load(signature):
+            print(f"Resuming run: {len(self.chunks)} chunks, "
+                  f"{len(self.profiles)} profiles and "
+                  f"{'the' if self.media_summary is not None else 'no'} media summary already done")
+            self._file = open(self.path, 'a', encoding='utf-8')
+            return
+        
+        self.chunks = {}
+        self.media_summary = None
+        self.profiles = {}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write({'kind': 'run', 'export': os.path.abspath(self.export_path), 'signature': signature})
+    
+    def get_chunk(self, chunk_index: int, chunk_key: str) -> Optional[Dict]:
+        """Previously completed analysis of a chunk, if it covered the same messages."""
+        entry = self.chunks.get(chunk_index)
+        if entry and entry['key'] == chunk_key:
+            return entry['result']
+        return None
+    
+    def record_chunk(self, chunk_index: int, chunk_key: str, result: Dict):
+        self.chunks[chunk_index] = {'key': chunk_key, 'result': result}
+        self._write({'kind': 'chunk', 'index': chunk_index, 'key': chunk_key, 'result': result})
+    
+    def record_media(self, media_summary: Dict[str, Any]):
+        self.media_summary = media_summary
+        self._write({'kind': 'media', 'result': media_summary})
+    
+    def record_profile(self, participant: str, profile: Dict[str, Any]):
+        self.profiles[participant] = profile
+        self._write({'kind': 'profile', 'participant': participant, 'result': profile})
+    
+    def finish(self):
+        """The run completed: close and delete the journal."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+    
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+    
+    def _write(self, record: Dict[str, Any]):
+        with self._lock:
+            if not self._file:
+                return
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._file.flush()
+    
+    def _load(self, signature: list) -> bool:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return False
+        
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A crash can leave the last line half written
+                break
+        
+        if not records or records[0].get('kind') != 'run' or records[0].get('signature') != signature:
+            print("Previous run does not match the current export, starting over")
+            return False
+        
+        for record in records[1:]:
+            kind = record.get('kind')
+            if kind == 'chunk':
+                self.chunks[record['index']] = {'key': record['key'], 'result': record['result']}
+            elif kind == 'media':
+                self.media_summary = record['result']
+            elif kind == 'profile':
+                self.profiles[record['participant']] = record['result']
+        
+        # Rewrite without any truncated tail so new records append cleanly
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        
+        return True
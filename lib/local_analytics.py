@@ -0,0 +1,643 @@
+"""
+Local Conversation Analytics
+Computes activity, response-time, reply-graph, sentiment and topic statistics
+with NumPy/pandas, without any API calls.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from lib.parser import ConversationIndex
+
+DAY_MS = 24 * 3600 * 1000
+HOUR_MS = 3600 * 1000
+# A pause longer than this starts a new session instead of counting as a response
+SESSION_GAP_MS = 6 * HOUR_MS
+LATENCY_BUCKETS_S = [60, 5 * 60, 15 * 60, 3600, 6 * 3600]
+PAGERANK_DAMPING = 0.85
+PAGERANK_ITERATIONS = 100
+
+# Lower-case forms, since emoji are matched in the lower-cased text along with words
+POSITIVE_EMOJI = frozenset(list('😀😁😂🤣😃😄😅😆😊😍🥰😘🙂🤗👍👏🙌🎉❤💕💖💯✨🔥') + [':)', ':d', '<3'])
+NEGATIVE_EMOJI = frozenset(list('😞😔😟😕🙁☹😣😖😫😩😢😭😤😠😡🤬💔👎😒🙄') + [':('])
+
+# Messages are joined with this separator (a control character; NumPy string
+# comparison would strip NUL) and scanned in one regex pass for words and emoji.
+# Counting separators in the matches recovers each match's message.
+_SEPARATOR = '\x1e'
+_TOKEN_RE = re.compile(
+    r"[a-z][a-z']+|[" + ''.join(e for e in POSITIVE_EMOJI | NEGATIVE_EMOJI if len(e) == 1) + _SEPARATOR + ']|'
+    + '|'.join(re.escape(e) for e in POSITIVE_EMOJI | NEGATIVE_EMOJI if len(e) > 1)
+)
+
+POSITIVE_WORDS = frozenset("""
+    love loved lovely like liked likes enjoy enjoyed awesome amazing great good nice cool fun funny
+    happy glad excited exciting thanks thank thx ty appreciate appreciated beautiful cute perfect best
+    better wonderful fantastic excellent brilliant sweet yay congrats congratulations proud haha lol
+    lmao hilarious agree yes yeah yep fine welcome helpful kind win won wins winning glad fair pleasure
+    interesting impressive incredible legendary epic hype hyped adore favourite favorite relieved safe
+""".split())
+
+NEGATIVE_WORDS = frozenset("""
+    hate hated hates bad awful terrible horrible worst worse sad angry mad annoyed annoying upset
+    sorry unfortunately wrong broken fail failed fails failure problem problems issue issues bug bugs
+    stupid dumb boring bored tired sick hurt hurts pain ugh damn crap sucks sucked disappointed
+    disappointing disgusting scared afraid worried worry anxious stress stressed lonely lost lose
+    losing lonely unfair rude cringe useless pointless hard difficult no nope never cry crying
+""".split())
+
+STOPWORDS = frozenset("""
+    the a an and or but if then so than that this these those there here what which who whom whose
+    when where why how all any both each few more most other some such only own same too very can
+    will just don't dont should now is are was were be been being have has had having do does did
+    doing i me my myself we our ours you your yours he him his she her hers it its they them their
+    theirs am at by for from in into of off on onto out over to up down with about again further
+    once as until while because before after above below between through during not no yes yeah
+    yep ok okay oh lol lmao haha im i'm it's its you're thats that's gonna wanna got get gets
+    like just also really would could one two much many even still well back going go know think
+    see say said want need make made let let's cause u ur ya yea hey hi hello thanks thank
+""".split())
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
+AUDIO_EXTENSIONS = {'.ogg', '.mp3', '.wav', '.m4a', '.flac'}
+
+
+class Tokens(NamedTuple):
+    """Every word of the conversation: its message row, author and vocabulary code."""
+    rows: np.ndarray
+    authors: np.ndarray
+    codes: np.ndarray
+    vocabulary: np.ndarray
+    
+    def mask(self, words) -> np.ndarray:
+        """Per-token mask of tokens whose word is in words."""
+        return np.isin(self.vocabulary, list(words))[self.codes]
+    
+    def word_mask(self) -> np.ndarray:
+        """Per-token mask of words, as opposed to emoji."""
+        is_word = np.fromiter(('a' <= token[0] <= 'z' for token in self.vocabulary),
+                              dtype=bool, count=len(self.vocabulary))
+        return is_word[self.codes]
+
+
+class LocalAnalyzer:
+    """
+    Vectorized statistics over a whole conversation.
+    
+    Messages are loaded once into NumPy/pandas columns (straight from a
+    MessageStore's column iterators when available) and every statistic is
+    a group-by or array operation on those columns, so millions of messages
+    take seconds. compute() returns plain JSON-ready dicts;
+    analysis_fields() turns them into the sentiment, topic, insight,
+    relationship and profile fields of a ConversationAnalysis.
+    """
+    
+    def __init__(self, top_terms: int = 15, session_gap_ms: int = SESSION_GAP_MS):
+        self.top_terms = top_terms
+        self.session_gap_ms = session_gap_ms
+    
+    def compute(self, messages: Sequence[Any], index: Optional[ConversationIndex] = None) -> Dict[str, Any]:
+        """All local statistics of the conversation."""
+        if index is None:
+            index = ConversationIndex(messages)
+        names = index.participants
+        frame = self._frame(messages, index)
+        
+        if frame.empty:
+            return {'participants': names, 'message_count': 0}
+        
+        tokens = self._tokens(frame)
+        scores = self._message_scores(frame, tokens)
+        responses = self._responses(frame)
+        
+        return {
+            'participants': names,
+            'message_count': len(frame),
+            'frequency': self._frequency(frame, tokens, names, responses),
+            'latency': self._latency(responses, names),
+            'centrality': self._centrality(frame, index, names, responses),
+            'sentiment': self._sentiment(frame, scores, names),
+            'topics': self._topics(frame, tokens, scores, names),
+            'media': self._media(messages),
+        }
+    
+    def analysis_fields(self, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Sentiment, topics, insights, relationship dynamics, media and profiles from compute()."""
+        if not stats.get('message_count'):
+            return {
+                'sentiment_analysis': {'overall_sentiment': 'neutral', 'sentiment_breakdown': {}},
+                'topics': [],
+                'key_insights': ['No messages to analyze'],
+                'relationship_dynamics': {},
+                'media_summary': {'total_files': 0, 'by_type': {}},
+                'participant_profiles': {}
+            }
+        
+        sentiment = stats['sentiment']
+        centrality = stats['centrality']
+        latency = stats['latency']
+        frequency = stats['frequency']
+        
+        return {
+            'sentiment_analysis': {
+                'overall_sentiment': sentiment['overall'],
+                'sentiment_breakdown': sentiment['breakdown'],
+                'sentiment_by_participant': {
+                    name: values['label'] for name, values in sentiment['by_participant'].items()
+                },
+                'emotional_highlights': sentiment['highlights'],
+                'emotional_tone': (f"{sentiment['breakdown']['positive']} positive and "
+                                   f"{sentiment['breakdown']['negative']} negative messages by word lexicon"),
+                'source': 'local'
+            },
+            'topics': stats['topics']['overall'],
+            'key_insights': self._insights(stats),
+            'relationship_dynamics': {
+                'communication_style': f"Median response time {_format_duration(latency['overall'].get('median_s'))}",
+                'power_dynamics': (f"{centrality['most_central']} is the most central participant in the reply graph"
+                                   if centrality['most_central'] else ''),
+                'interaction_patterns': f"{len(centrality['top_pairs'])} recurring reply pairs",
+                'top_reply_pairs': centrality['top_pairs'],
+                'source': 'local'
+            },
+            'media_summary': stats['media'],
+            'participant_profiles': {
+                name: self._profile(name, stats) for name in stats['participants']
+                if frequency['by_participant'].get(name, {}).get('messages')
+            }
+        }
+    
+    def describe_participant(self, name: str, stats: Dict[str, Any]) -> str:
+        """One line of measured activity for a participant, for use in prompts."""
+        activity = stats.get('frequency', {}).get('by_participant', {}).get(name)
+        if not activity:
+            return ''
+        latency = stats['latency']['by_participant'].get(name, {})
+        centrality = stats['centrality']['by_participant'].get(name, {})
+        parts = [
+            f"{activity['messages']} messages ({activity['share']:.0%} of the conversation)",
+            f"{activity['messages_per_active_day']:.1f} per active day",
+            f"most active at {activity['peak_hour_utc']:02d}:00 UTC",
+            f"{activity['avg_words']:.0f} words per message",
+        ]
+        if latency.get('median_s') is not None:
+            parts.append(f"median reply time {_format_duration(latency['median_s'])}")
+        if centrality:
+            parts.append(f"{centrality.get('replies_sent', 0)} replies sent, "
+                         f"{centrality.get('replies_received', 0)} received")
+        return ', '.join(parts)
+    
+    def _frame(self, messages: Sequence[Any], index: ConversationIndex) -> pd.DataFrame:
+        """Time-ordered columns: position, timestamp, author code, content, attachment count."""
+        count = len(messages)
+        codes = np.zeros(count, dtype=np.int32)
+        for code, postings in enumerate(index.author_postings.values()):
+            codes[np.frombuffer(postings, dtype=np.uint32)] = code
+        
+        if hasattr(messages, 'iter_contents'):
+            timestamps = messages.timestamps_ms_array()
+            contents = list(messages.iter_contents())
+            attachments = np.fromiter((len(a) for a in messages.iter_attachments()), dtype=np.int32, count=count)
+        else:
+            timestamps = np.fromiter((m.timestamp_ms for m in messages), dtype=np.int64, count=count)
+            contents = [m.content for m in messages]
+            attachments = np.fromiter((len(m.attachments) for m in messages), dtype=np.int32, count=count)
+        
+        frame = pd.DataFrame({
+            'position': np.arange(count),
+            'ts': timestamps,
+            'author': codes,
+            'content': contents,
+            'attachments': attachments,
+        })
+        return frame.sort_values('ts', kind='stable').reset_index(drop=True)
+    
+    def _tokens(self, frame: pd.DataFrame) -> Tokens:
+        """Lower-cased words and emoji of all messages, found in a single regex pass."""
+        text = _SEPARATOR.join(frame['content'].tolist()).lower()
+        found = np.array(_TOKEN_RE.findall(text), dtype=object)
+        separators = found == _SEPARATOR
+        rows = np.cumsum(separators)[~separators]
+        codes, vocabulary = pd.factorize(found[~separators])
+        return Tokens(rows, frame['author'].to_numpy()[rows], codes, np.asarray(vocabulary, dtype=object))
+    
+    def _message_scores(self, frame: pd.DataFrame, tokens: Tokens) -> np.ndarray:
+        """Lexicon sentiment score per message row (positive minus negative words and emoji)."""
+        count = len(frame)
+        positive = np.bincount(tokens.rows[tokens.mask(POSITIVE_WORDS | POSITIVE_EMOJI)], minlength=count)
+        negative = np.bincount(tokens.rows[tokens.mask(NEGATIVE_WORDS | NEGATIVE_EMOJI)], minlength=count)
+        return (positive - negative).astype(np.int32)
+    
+    def _responses(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Turns where the speaker changed within a session: responder, previous author, latency."""
+        ts = frame['ts'].to_numpy()
+        authors = frame['author'].to_numpy()
+        gaps = np.diff(ts)
+        mask = (authors[1:] != authors[:-1]) & (gaps >= 0) & (gaps <= self.session_gap_ms)
+        return pd.DataFrame({
+            'row': np.nonzero(mask)[0] + 1,
+            'responder': authors[1:][mask],
+            'previous': authors[:-1][mask],
+            'latency_s': gaps[mask] / 1000.0
+        })
+    
+    def _frequency(self, frame: pd.DataFrame, tokens: Tokens, names: List[str],
+                   responses: pd.DataFrame) -> Dict[str, Any]:
+        ts = frame['ts'].to_numpy()
+        authors = frame['author'].to_numpy()
+        days = ts // DAY_MS
+        hours = (ts // HOUR_MS) % 24
+        weekdays = (days + 3) % 7  # 1970-01-01 was a Thursday; Monday is 0
+        
+        counts = np.bincount(authors, minlength=len(names))
+        by_hour = np.zeros((len(names), 24), dtype=np.int64)
+        np.add.at(by_hour, (authors, hours), 1)
+        active_days = pd.Series(days).groupby(authors).nunique()
+        word_totals = np.bincount(tokens.authors[tokens.word_mask()], minlength=len(names))
+        attachment_totals = np.bincount(authors, weights=frame['attachments'].to_numpy(), minlength=len(names))
+        
+        # Messages opening a session after a long pause
+        gaps = np.diff(ts, prepend=ts[0] - self.session_gap_ms - 1)
+        starts = np.bincount(authors[gaps > self.session_gap_ms], minlength=len(names))
+        
+        daily = pd.Series(days).value_counts()
+        total = int(counts.sum())
+        by_participant = {}
+        for code, name in enumerate(names):
+            if not counts[code]:
+                continue
+            by_participant[name] = {
+                'messages': int(counts[code]),
+                'share': round(counts[code] / total, 4),
+                'active_days': int(active_days.get(code, 0)),
+                'messages_per_active_day': round(counts[code] / max(1, active_days.get(code, 0)), 2),
+                'peak_hour_utc': int(by_hour[code].argmax()),
+                'avg_words': round(word_totals[code] / counts[code], 2),
+                'attachments': int(attachment_totals[code]),
+                'session_starts': int(starts[code]),
+            }
+        
+        return {
+            'total_messages': total,
+            'active_days': int(len(daily)),
+            'messages_per_active_day': round(total / max(1, len(daily)), 2),
+            'busiest_day': _format_day(int(daily.index[0])) if len(daily) else None,
+            'busiest_day_messages': int(daily.iloc[0]) if len(daily) else 0,
+            'by_hour_utc': np.bincount(hours, minlength=24).tolist(),
+            'by_weekday': np.bincount(weekdays, minlength=7).tolist(),
+            'sessions': int(starts.sum()),
+            'by_participant': by_participant,
+        }
+    
+    def _latency(self, responses: pd.DataFrame, names: List[str]) -> Dict[str, Any]:
+        latencies = responses['latency_s'].to_numpy()
+        overall = {'responses': int(len(latencies))}
+        if len(latencies):
+            p50, p75, p90, p99 = np.percentile(latencies, [50, 75, 90, 99])
+            overall.update(median_s=round(p50, 1), p75_s=round(p75, 1), p90_s=round(p90, 1), p99_s=round(p99, 1))
+            edges = [0] + LATENCY_BUCKETS_S
+            if self.session_gap_ms / 1000.0 > edges[-1]:
+                edges.append(self.session_gap_ms / 1000.0)
+            histogram, _ = np.histogram(latencies, bins=edges)
+            overall['histogram'] = {
+                f"<={_format_duration(edge)}": int(n) for edge, n in zip(edges[1:], histogram)
+            }
+        
+        grouped = responses.groupby('responder')['latency_s']
+        medians = grouped.median()
+        p90s = grouped.quantile(0.9)
+        sizes = grouped.size()
+        by_participant = {
+            names[code]: {
+                'responses': int(sizes[code]),
+                'median_s': round(float(medians[code]), 1),
+                'p90_s': round(float(p90s[code]), 1),
+            }
+            for code in medians.index
+        }
+        return {'overall': overall, 'by_participant': by_participant}
+    
+    def _centrality(self, frame: pd.DataFrame, index: ConversationIndex, names: List[str],
+                    responses: pd.DataFrame) -> Dict[str, Any]:
+        """Weighted reply graph from explicit replies plus turn-taking, with PageRank."""
+        participant_count = len(names)
+        author_by_position = np.empty(len(frame), dtype=np.int32)
+        author_by_position[frame['position'].to_numpy()] = frame['author'].to_numpy()
+        
+        if index.reply_parent:
+            children = np.fromiter(index.reply_parent.keys(), dtype=np.int64, count=len(index.reply_parent))
+            parents = np.fromiter(index.reply_parent.values(), dtype=np.int64, count=len(index.reply_parent))
+            reply_src, reply_dst = author_by_position[children], author_by_position[parents]
+        else:
+            reply_src = reply_dst = np.empty(0, dtype=np.int32)
+        
+        src = np.concatenate([reply_src, responses['responder'].to_numpy()])
+        dst = np.concatenate([reply_dst, responses['previous'].to_numpy()])
+        keep = src != dst
+        src, dst = src[keep], dst[keep]
+        
+        in_degree = np.bincount(dst, minlength=participant_count)
+        out_degree = np.bincount(src, minlength=participant_count)
+        ranks = _pagerank(src, dst, participant_count)
+        
+        pairs = (pd.DataFrame({'src': src, 'dst': dst}).value_counts().head(10))
+        top_pairs = [
+            {'from': names[s], 'to': names[d], 'interactions': int(n)} for (s, d), n in pairs.items()
+        ]
+        
+        by_participant = {
+            name: {
+                'pagerank': round(float(ranks[code]), 4),
+                'replies_received': int(in_degree[code]),
+                'replies_sent': int(out_degree[code]),
+            }
+            for code, name in enumerate(names)
+        }
+        most_central = names[int(ranks.argmax())] if participant_count and len(src) else None
+        return {
+            'explicit_replies': int(len(reply_src)),
+            'most_central': most_central,
+            'top_pairs': top_pairs,
+            'by_participant': by_participant,
+        }
+    
+    def _sentiment(self, frame: pd.DataFrame, scores: np.ndarray, names: List[str]) -> Dict[str, Any]:
+        authors = frame['author'].to_numpy()
+        positive = scores > 0
+        negative = scores < 0
+        breakdown = {
+            'positive': int(positive.sum()),
+            'negative': int(negative.sum()),
+            'neutral': int(len(scores) - positive.sum() - negative.sum()),
+        }
+        overall = _sentiment_label(breakdown['positive'], breakdown['negative'], len(scores))
+        
+        by_participant = {}
+        pos_counts = np.bincount(authors[positive], minlength=len(names))
+        neg_counts = np.bincount(authors[negative], minlength=len(names))
+        totals = np.bincount(authors, minlength=len(names))
+        for code, name in enumerate(names):
+            if totals[code]:
+                by_participant[name] = {
+                    'label': _sentiment_label(pos_counts[code], neg_counts[code], totals[code]),
+                    'positive_share': round(pos_counts[code] / totals[code], 4),
+                    'negative_share': round(neg_counts[code] / totals[code], 4),
+                }
+        
+        # Days with clearly skewed sentiment, among days with enough messages to matter
+        daily = pd.DataFrame({'day': frame['ts'].to_numpy() // DAY_MS, 'score': np.sign(scores)})
+        daily = daily.groupby('day')['score'].agg(['mean', 'size'])
+        daily = daily[daily['size'] >= max(5, int(daily['size'].median()))]
+        highlights = []
+        for day, row in daily.nlargest(3, 'mean').iterrows():
+            if row['mean'] > 0:
+                highlights.append(f"{_format_day(int(day))}: unusually positive ({int(row['size'])} messages)")
+        for day, row in daily.nsmallest(3, 'mean').iterrows():
+            if row['mean'] < 0:
+                highlights.append(f"{_format_day(int(day))}: unusually negative ({int(row['size'])} messages)")
+        
+        return {'overall': overall, 'breakdown': breakdown, 'by_participant': by_participant, 'highlights': highlights}
+    
+    def _topics(self, frame: pd.DataFrame, tokens: Tokens, scores: np.ndarray,
+                names: List[str]) -> Dict[str, Any]:
+        """TF-IDF keywords: per participant (participants as documents) and overall (days as documents)."""
+        vocabulary = tokens.vocabulary
+        candidate = np.fromiter((len(word) >= 3 and 'a' <= word[0] <= 'z' for word in vocabulary),
+                                dtype=bool, count=len(vocabulary))
+        candidate &= ~np.isin(vocabulary, list(STOPWORDS))
+        keep = candidate[tokens.codes]
+        if not keep.any():
+            return {'overall': [], 'by_participant': {}, 'likes': {}, 'dislikes': {}}
+        
+        rows = tokens.rows[keep]
+        authors = tokens.authors[keep]
+        codes = tokens.codes[keep]
+        
+        by_participant = {
+            names[doc]: [vocabulary[code] for code in top]
+            for doc, top in _tfidf_top(authors, codes, len(vocabulary), self.top_terms).items()
+        }
+        
+        days = frame['ts'].to_numpy()[rows] // DAY_MS
+        _, day_docs = np.unique(days, return_inverse=True)
+        docs, terms, day_scores = _tfidf_scores(day_docs, codes, len(vocabulary))
+        overall_scores = np.bincount(terms, weights=day_scores, minlength=len(vocabulary))
+        overall = [vocabulary[code] for code in _top_indices(overall_scores, self.top_terms)]
+        
+        # Words a participant uses most in their positive / negative messages
+        message_scores = scores[rows]
+        likes = _top_terms_by_author(authors, codes, message_scores > 0, vocabulary, names)
+        dislikes = _top_terms_by_author(authors, codes, message_scores < 0, vocabulary, names)
+        
+        return {'overall': overall, 'by_participant': by_participant, 'likes': likes, 'dislikes': dislikes}
+    
+    def _media(self, messages: Sequence[Any]) -> Dict[str, Any]:
+        """Attachment counts by type from file extensions, without opening any files."""
+        if hasattr(messages, 'iter_attachments'):
+            attachments = [path for paths in messages.iter_attachments() for path in paths]
+        else:
+            attachments = [path for msg in messages for path in msg.attachments]
+        
+        by_type = {}
+        for path in attachments:
+            media_type = _media_type(os.path.splitext(path.split('?', 1)[0])[1].lower())
+            by_type[media_type] = by_type.get(media_type, 0) + 1
+        return {'total_files': len(attachments), 'by_type': by_type, 'source': 'local'}
+    
+    def _insights(self, stats: Dict[str, Any]) -> List[str]:
+        frequency = stats['frequency']
+        latency = stats['latency']['overall']
+        centrality = stats['centrality']
+        insights = []
+        
+        ranked = sorted(frequency['by_participant'].items(), key=lambda item: item[1]['messages'], reverse=True)
+        if ranked:
+            name, values = ranked[0]
+            insights.append(f"{name} sent the most messages ({values['share']:.0%} of the conversation)")
+        insights.append(f"{frequency['total_messages']} messages over {frequency['active_days']} active days "
+                        f"({frequency['messages_per_active_day']} per active day)")
+        if frequency['busiest_day']:
+            insights.append(f"Busiest day was {frequency['busiest_day']} with {frequency['busiest_day_messages']} messages")
+        peak_hour = int(np.argmax(frequency['by_hour_utc']))
+        insights.append(f"Most active hour is {peak_hour:02d}:00 UTC")
+        if latency.get('median_s') is not None:
+            insights.append(f"Half of all replies come within {_format_duration(latency['median_s'])}, "
+                            f"90% within {_format_duration(latency['p90_s'])}")
+        if centrality['most_central']:
+            insights.append(f"{centrality['most_central']} is at the center of the reply graph")
+        if centrality['top_pairs']:
+            pair = centrality['top_pairs'][0]
+            insights.append(f"Most frequent exchange: {pair['from']} responding to {pair['to']} "
+                            f"({pair['interactions']} times)")
+        insights.append(f"{frequency['sessions']} separate conversation sessions")
+        return insights
+    
+    def _profile(self, name: str, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """ParticipantProfile fields for one participant from the local statistics."""
+        participants = len(stats['frequency']['by_participant']) or 1
+        activity = stats['frequency']['by_participant'][name]
+        latency = stats['latency']['by_participant'].get(name, {})
+        centrality = stats['centrality']['by_participant'].get(name, {})
+        sentiment = stats['sentiment']['by_participant'].get(name, {})
+        topics = stats['topics']
+        
+        traits = []
+        if activity['peak_hour_utc'] < 5:
+            traits.append('Night owl')
+        if latency.get('median_s') is not None and latency['median_s'] < 60:
+            traits.append('Quick responder')
+        if activity['session_starts'] >= max(3, stats['frequency']['sessions'] / participants * 1.5):
+            traits.append('Conversation starter')
+        if activity['attachments'] >= activity['messages'] * 0.2:
+            traits.append('Media sharer')
+        if activity['avg_words'] >= 25:
+            traits.append('Verbose')
+        elif activity['avg_words'] <= 5:
+            traits.append('Concise')
+        if sentiment.get('label') in ('positive', 'negative'):
+            traits.append(f"Mostly {sentiment['label']} tone")
+        
+        fair_share = 1.0 / participants
+        pagerank = centrality.get('pagerank', 0.0)
+        if stats['centrality']['most_central'] == name and participants > 1:
+            role = 'Central connector'
+        elif activity['session_starts'] and 'Conversation starter' in traits:
+            role = 'Conversation starter'
+        elif centrality.get('replies_sent', 0) > 2 * max(1, centrality.get('replies_received', 0)):
+            role = 'Responder'
+        else:
+            role = 'Participant'
+        
+        response_text = (f", typically replies within {_format_duration(latency['median_s'])}"
+                         if latency.get('median_s') is not None else '')
+        return {
+            'name': name,
+            'personality_traits': traits,
+            'communication_style': f"About {activity['avg_words']:.0f} words per message{response_text}",
+            'likes': topics['likes'].get(name, []),
+            'dislikes': topics['dislikes'].get(name, []),
+            'interests': topics['by_participant'].get(name, [])[:10],
+            'important_ideas': [],
+            'emotional_patterns': [
+                f"{sentiment.get('positive_share', 0):.0%} positive, "
+                f"{sentiment.get('negative_share', 0):.0%} negative messages"
+            ],
+            'role_in_conversation': role,
+            'activity_level': _level(activity['share'], fair_share),
+            'influence_level': _level(pagerank, fair_share),
+        }
+
+
+def _pagerank(src: np.ndarray, dst: np.ndarray, count: int) -> np.ndarray:
+    """PageRank over a weighted edge list (duplicate edges add weight) by power iteration."""
+    if count == 0:
+        return np.zeros(0)
+    ranks = np.full(count, 1.0 / count)
+    if not len(src):
+        # Without edges every node is dangling and the ranks stay uniform
+        return ranks
+    out_weight = np.bincount(src, minlength=count).astype(float)
+    dangling = out_weight == 0
+    for _ in range(PAGERANK_ITERATIONS):
+        flow = np.bincount(dst, weights=ranks[src] / out_weight[src], minlength=count)
+        updated = (1 - PAGERANK_DAMPING) / count + PAGERANK_DAMPING * (flow + ranks[dangling].sum() / count)
+        if np.abs(updated - ranks).sum() < 1e-9:
+            return updated
+        ranks = updated
+    return ranks
+
+
+def _tfidf_scores(docs: np.ndarray, codes: np.ndarray, vocabulary_size: int):
+    """TF-IDF score per (document, term) pair present, with smoothed IDF."""
+    keys = docs.astype(np.int64) * vocabulary_size + codes
+    counts = pd.Series(keys).value_counts(sort=False)
+    pair_docs = (counts.index.to_numpy() // vocabulary_size).astype(np.int64)
+    pair_terms = (counts.index.to_numpy() % vocabulary_size).astype(np.int64)
+    pair_counts = counts.to_numpy().astype(float)
+    
+    doc_totals = np.bincount(pair_docs, weights=pair_counts)
+    doc_freq = np.bincount(pair_terms, minlength=vocabulary_size)
+    doc_count = len(np.unique(pair_docs))
+    idf = np.log((1 + doc_count) / (1 + doc_freq)) + 1
+    return pair_docs, pair_terms, pair_counts / doc_totals[pair_docs] * idf[pair_terms]
+
+
+def _tfidf_top(docs: np.ndarray, codes: np.ndarray, vocabulary_size: int, limit: int) -> Dict[int, List[int]]:
+    """Highest scoring term codes per document."""
+    pair_docs, pair_terms, scores = _tfidf_scores(docs, codes, vocabulary_size)
+    return _top_per_group(pair_docs, pair_terms, scores, limit)
+
+
+def _top_terms_by_author(authors: np.ndarray, codes: np.ndarray, mask: np.ndarray, vocabulary: np.ndarray,
+                         names: List[str], limit: int = 5) -> Dict[str, List[str]]:
+    """Most frequent words per author among the masked tokens."""
+    if not mask.any():
+        return {}
+    keys = authors[mask].astype(np.int64) * len(vocabulary) + codes[mask]
+    counts = pd.Series(keys).value_counts(sort=False)
+    pair_authors = counts.index.to_numpy() // len(vocabulary)
+    pair_terms = counts.index.to_numpy() % len(vocabulary)
+    top = _top_per_group(pair_authors, pair_terms, counts.to_numpy().astype(float), limit)
+    return {names[author]: [vocabulary[code] for code in terms] for author, terms in top.items()}
+
+
+def _top_per_group(groups: np.ndarray, items: np.ndarray, scores: np.ndarray, limit: int) -> Dict[int, List[int]]:
+    """The limit highest scoring items of every group."""
+    order = np.lexsort((-scores, groups))
+    groups, items = groups[order], items[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    ends = np.r_[starts[1:], len(groups)]
+    return {int(groups[start]): items[start:min(end, start + limit)].tolist() for start, end in zip(starts, ends)}
+
+
+def _top_indices(values: np.ndarray, limit: int) -> List[int]:
+    """Indices of the limit largest positive values, largest first."""
+    top = np.argsort(-values, kind='stable')[:limit]
+    return [int(i) for i in top if values[i] > 0]
+
+
+def _sentiment_label(positive: int, negative: int, total: int) -> str:
+    if total == 0 or positive + negative < 0.05 * total:
+        return 'neutral'
+    if positive >= 1.5 * negative:
+        return 'positive'
+    if negative >= 1.5 * positive:
+        return 'negative'
+    return 'mixed'
+
+
+def _level(value: float, fair_share: float) -> str:
+    if value >= 1.5 * fair_share:
+        return 'High'
+    if value >= 0.5 * fair_share:
+        return 'Medium'
+    return 'Low'
+
+
+def _media_type(extension: str) -> str:
+    if extension in IMAGE_EXTENSIONS:
+        return 'image'
+    if extension in VIDEO_EXTENSIONS:
+        return 'video'
+    if extension in AUDIO_EXTENSIONS:
+        return 'audio'
+    return 'document'
+
+
+def _format_day(day: int) -> str:
+    return pd.Timestamp(day * DAY_MS, unit='ms').strftime('%Y-%m-%d')
+
+
+def _format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return 'unknown'
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
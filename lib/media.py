@@ -4,35 +4,97 @@ Analyzes media files (images, videos, audio) using various techniques.
 """
 
 import os
+import json
+import time
+import struct
+import importlib
+import importlib.util
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import numpy as np
 
-# Optional imports with fallbacks
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
+from lib.dedup import content_hash, perceptual_hashes, duplicate_clusters
+from lib.video_probe import probe_video
 
-try:
-    import cv2
-    CV2_AVAILABLE = True
-except ImportError:
-    CV2_AVAILABLE = False
+# Optional backends are imported the first time a file needs them: cv2 and
+# librosa (with numba and scipy behind it) take seconds to import, and many
+# exports have no video or audio at all
+BACKEND_MODULES = {
+    'PIL': 'PIL.Image',
+    'cv2': 'cv2',
+    'librosa': 'librosa',
+    'soundfile': 'soundfile'
+}
+_backends: Dict[str, Any] = {}
+_backends_lock = threading.Lock()
 
-try:
-    import librosa
-    LIBROSA_AVAILABLE = True
-except ImportError:
-    LIBROSA_AVAILABLE = False
+# Video containers whose metadata the header probe reads without OpenCV
+HEADER_PROBED_VIDEO_FORMATS = {'.mp4', '.mov', '.mkv', '.webm'}
+# Files per process pool task, and the fewest cache misses worth starting a pool for
+MEDIA_BATCH_SIZE = 32
+MIN_POOL_FILES = 16
+# Threads hashing file contents (I/O bound; hashlib releases the GIL)
+HASH_THREADS = 8
+# Sampled video frames are shrunk to this size before computing features
+FRAME_FEATURE_SIZE = (64, 36)
+# Half the L1 distance between consecutive frames' color histograms above which a scene cut is counted
+SCENE_CUT_THRESHOLD = 0.5
+# Image features are computed on a thumbnail about this many pixels on its short side
+IMAGE_FEATURE_SIZE = 128
+DOMINANT_COLORS = 5
+# Share of flat neighboring pixels and of the dominant colors above which an image looks like a screenshot
+SCREENSHOT_FLAT_RATIO = 0.6
+SCREENSHOT_COLOR_COVERAGE = 0.5
+# Audio features are computed per frame of AUDIO_FRAME_LENGTH samples, read
+# AUDIO_BLOCK_FRAMES frames at a time so memory stays constant per file
+AUDIO_FRAME_LENGTH = 2048
+AUDIO_BLOCK_FRAMES = 64
+# Frames quieter than this (dBFS) count as silence
+SILENCE_THRESHOLD_DB = -40.0
+
+
+def load_backend(name: str):
+    """The backend module, imported on first use, or None if it isn't installed."""
+    if name not in _backends:
+        with _backends_lock:
+            if name not in _backends:
+                try:
+                    _backends[name] = importlib.import_module(BACKEND_MODULES[name])
+                except ImportError:
+                    _backends[name] = None
+    return _backends[name]
+
+
+def backend_installed(name: str) -> bool:
+    """Whether a backend is installed, found without importing it."""
+    return importlib.util.find_spec(BACKEND_MODULES[name].split('.')[0]) is not None
 
 
 class MediaAnalyzer:
-    """Analyzes media files (images, videos, audio) using various techniques."""
+    """
+    Analyzes media files (images, videos, audio) using various techniques.
+    
+    analyze_files() looks every file up in the optional metadata cache (keyed
+    by path, size and mtime), then by content hash, so each distinct file is
+    analyzed once on a process pool and the result is shared by every copy.
+    Audio and video are described from their container headers; features
+    that need decoding are opt-in: audio spectral features with
+    spectral_features=True, and video features from video_sample_frames
+    frames sampled within video_time_budget seconds per file.
+    """
     
-    def __init__(self, files_directory: str):
+    def __init__(self, files_directory: str, cache=None, spectral_features: bool = False,
+                 max_workers: Optional[int] = None, video_sample_frames: int = 0,
+                 video_time_budget: float = 5.0):
         self.files_directory = Path(files_directory)
+        self.cache = cache
+        self.spectral_features = spectral_features
+        self.max_workers = max_workers
+        self.video_sample_frames = video_sample_frames
+        self.video_time_budget = video_time_budget
         self.supported_image_formats = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
         self.supported_video_formats = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
         self.supported_audio_formats = {'.ogg', '.mp3', '.wav', '.m4a', '.flac'}
@@ -67,6 +129,116 @@ class MediaAnalyzer:
         
         return analysis
     
+    def analyze_files(self, file_paths: List[str]) -> List[Dict[str, Any]]:
+        """Analyze many files, reusing cached results and analyzing identical files once, in the order given."""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(file_paths)
+        keys = {}
+        unresolved = []
+        for i, file_path in enumerate(file_paths):
+            key = self._cache_key(file_path)
+            cached = self.cache.get(key) if self.cache and key else None
+            if cached is not None:
+                results[i] = json.loads(cached)
+            else:
+                keys[i] = key
+                unresolved.append(i)
+        
+        # Group the rest by content so every copy of a file shares one analysis
+        by_content: Dict[str, List[int]] = {}
+        with ThreadPoolExecutor(max_workers=HASH_THREADS) as pool:
+            for i, digest in zip(unresolved, pool.map(_try_content_hash, [file_paths[i] for i in unresolved])):
+                if digest is None:
+                    results[i] = self.analyze_file(file_paths[i])
+                else:
+                    by_content.setdefault(digest, []).append(i)
+        
+        analyses = {}
+        pending = []
+        for digest, positions in by_content.items():
+            cached = self.cache.get(self._content_key(digest)) if self.cache else None
+            if cached is not None:
+                analyses[digest] = json.loads(cached)
+            else:
+                pending.append(positions[0])
+        
+        if pending:
+            print(f"Analyzing {len(pending)} distinct media files "
+                  f"({len(file_paths) - len(unresolved)} cached, "
+                  f"{sum(len(positions) - 1 for positions in by_content.values())} duplicates)...")
+        
+        digests = {positions[0]: digest for digest, positions in by_content.items()}
+        for i, analysis in self._analyze_pending(file_paths, pending):
+            analysis['content_hash'] = digests[i]
+            analyses[digests[i]] = analysis
+            # Errors may be transient, so they are never cached
+            if self.cache and 'error' not in analysis:
+                self.cache.set(self._content_key(digests[i]), json.dumps(analysis))
+        
+        for digest, positions in by_content.items():
+            for i in positions:
+                analysis = dict(analyses[digest], filename=os.path.basename(file_paths[i]))
+                results[i] = analysis
+                if self.cache and keys[i] and 'error' not in analysis:
+                    self.cache.set(keys[i], json.dumps(analysis))
+        
+        return results
+    
+    def find_duplicates(self, analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Exact and near-duplicate clusters among analyze_files() results."""
+        return duplicate_clusters(analyses)
+    
+    def _analyze_pending(self, file_paths: List[str], pending: List[int]):
+        """Yield (position, analysis) for the given positions, on a process pool when there are many."""
+        if len(pending) < MIN_POOL_FILES or self.max_workers == 1:
+            for i in pending:
+                yield i, self.analyze_file(file_paths[i])
+            return
+        
+        batches = [pending[start:start + MEDIA_BATCH_SIZE] for start in range(0, len(pending), MEDIA_BATCH_SIZE)]
+        done = 0
+        # Spawned rather than forked workers: the parent runs threads (API
+        # requests, the event loop) that must not be duplicated mid-operation
+        with ProcessPoolExecutor(max_workers=self.max_workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {
+                pool.submit(_analyze_media_batch, str(self.files_directory), self._analysis_options(),
+                            [file_paths[i] for i in batch]): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    analyses = future.result()
+                except Exception as e:
+                    analyses = [{'filename': os.path.basename(file_paths[i]), 'error': str(e)} for i in batch]
+                
+                yield from zip(batch, analyses)
+                done += len(batch)
+                print(f"[{done}/{len(pending)}] media files analyzed")
+    
+    def _cache_key(self, file_path: str) -> Optional[str]:
+        """Cache key from the file's identity and the analysis options, or None without a cache or if it can't be stat'ed."""
+        if self.cache is None:
+            return None
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return self.cache.make_key(os.path.abspath(file_path), st.st_size, st.st_mtime_ns,
+                                   self._analysis_options())
+    
+    def _content_key(self, digest: str) -> str:
+        """Cache key from the file's content hash and the analysis options."""
+        return self.cache.make_content_key(digest, self._analysis_options())
+    
+    def _analysis_options(self) -> Dict[str, Any]:
+        """Constructor options that change analysis results (passed to pool workers and cache keys)."""
+        return {
+            'spectral_features': self.spectral_features,
+            'video_sample_frames': self.video_sample_frames,
+            'video_time_budget': self.video_time_budget
+        }
+    
     def _get_file_type(self, extension: str) -> str:
         """Determine file type from extension."""
         if extension in self.supported_image_formats:
@@ -80,24 +252,48 @@ class MediaAnalyzer:
     
     def _analyze_image(self, file_path: Path) -> Dict[str, Any]:
         """Analyze image file and extract metadata."""
-        if not PIL_AVAILABLE:
+        Image = load_backend('PIL')
+        if Image is None:
             return {'error': 'PIL not available for image analysis'}
         
         try:
             with Image.open(file_path) as img:
-                return {
+                analysis = {
                     'width': img.width,
                     'height': img.height,
                     'format': img.format,
                     'mode': img.mode,
                     'has_transparency': img.mode in ('RGBA', 'LA') or 'transparency' in img.info
                 }
+                thumbnail = _image_thumbnail(img)
+                # Perceptual hashes find resized or recompressed copies
+                analysis.update(perceptual_hashes(thumbnail))
+                analysis.update(_image_features(thumbnail, analysis))
+                return analysis
         except Exception as e:
             return {'error': f'Image analysis failed: {e}'}
     
     def _analyze_video(self, file_path: Path) -> Dict[str, Any]:
         """Analyze video file and extract metadata."""
-        if not CV2_AVAILABLE:
+        try:
+            analysis = probe_video(str(file_path))
+        except (OSError, struct.error, ValueError):
+            analysis = None
+        
+        if analysis is None:
+            # Containers the header probe doesn't know (e.g. AVI) need a decoder
+            analysis = self._capture_video_metadata(file_path)
+            if 'error' in analysis:
+                return analysis
+        
+        if self.video_sample_frames > 0:
+            analysis.update(self._sample_video_frames(file_path, analysis.get('duration')))
+        return analysis
+    
+    def _capture_video_metadata(self, file_path: Path) -> Dict[str, Any]:
+        """Video metadata as reported by OpenCV's decoder."""
+        cv2 = load_backend('cv2')
+        if cv2 is None:
             return {'error': 'OpenCV not available for video analysis'}
         
         try:
@@ -123,32 +319,103 @@ class MediaAnalyzer:
         except Exception as e:
             return {'error': f'Video analysis failed: {e}'}
     
+    def _sample_video_frames(self, file_path: Path, duration: Optional[float]) -> Dict[str, Any]:
+        """
+        Mean color, motion energy and scene cuts from frames sampled evenly
+        through the video, stopping once video_time_budget is spent.
+        """
+        cv2 = load_backend('cv2')
+        if cv2 is None:
+            return {'frame_sample_error': 'OpenCV not available for frame sampling'}
+        
+        deadline = time.monotonic() + self.video_time_budget
+        cap = cv2.VideoCapture(str(file_path))
+        if not cap.isOpened():
+            return {'frame_sample_error': 'Could not open video file'}
+        
+        count = self.video_sample_frames
+        colors, grays, histograms = [], [], []
+        try:
+            for i in range(count):
+                if time.monotonic() > deadline:
+                    break
+                if duration:
+                    # Seeking by time lands on (or decodes forward from) the nearest keyframe
+                    cap.set(cv2.CAP_PROP_POS_MSEC, (i + 0.5) * duration / count * 1000)
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                small = cv2.resize(frame, FRAME_FEATURE_SIZE, interpolation=cv2.INTER_AREA)
+                colors.append(small.reshape(-1, 3).mean(axis=0)[::-1])
+                grays.append(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32))
+                histogram = cv2.calcHist([small], [0, 1, 2], None, [8, 8, 8], [0, 256, 0, 256, 0, 256]).ravel()
+                histograms.append(histogram / max(histogram.sum(), 1.0))
+        finally:
+            cap.release()
+        
+        if not colors:
+            return {'frame_sample_error': 'No frames could be decoded'}
+        
+        motion = [float(np.mean(np.abs(b - a))) / 255.0 for a, b in zip(grays, grays[1:])]
+        cuts = sum(1 for a, b in zip(histograms, histograms[1:]) if np.abs(b - a).sum() / 2 > SCENE_CUT_THRESHOLD)
+        return {
+            'sampled_frames': len(colors),
+            'mean_color': [int(round(c)) for c in np.mean(colors, axis=0)],
+            'motion_energy': round(float(np.mean(motion)), 4) if motion else 0.0,
+            'scene_cuts': cuts,
+            'sampling_truncated': len(colors) < count
+        }
+    
     def _analyze_audio(self, file_path: Path) -> Dict[str, Any]:
         """Analyze audio file and extract metadata."""
-        if not LIBROSA_AVAILABLE:
-            return {'error': 'Librosa not available for audio analysis'}
-        
+        soundfile = load_backend('soundfile')
         try:
-            y, sr = librosa.load(str(file_path))
-            duration = len(y) / sr
+            if soundfile is not None:
+                try:
+                    with soundfile.SoundFile(str(file_path)) as f:
+                        analysis = {
+                            'sample_rate': f.samplerate,
+                            'duration': f.frames / f.samplerate if f.samplerate else 0,
+                            'channels': f.channels,
+                            'format': f.format,
+                            'subtype': f.subtype
+                        }
+                        if self.spectral_features:
+                            # Same handle, so short voice messages are opened and read once
+                            analysis.update(_stream_audio_features(f))
+                        return analysis
+                except RuntimeError:
+                    # Formats libsndfile can't read (e.g. m4a) go through librosa
+                    pass
             
-            return {
-                'sample_rate': sr,
-                'duration': duration,
-                'channels': 1 if y.ndim == 1 else y.shape[0],
-                'rms_energy': float(np.sqrt(np.mean(y**2))),
-                'spectral_centroid': float(np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)))
+            librosa = load_backend('librosa')
+            if librosa is None:
+                return {'error': 'Neither soundfile nor librosa available for audio analysis'}
+            analysis = {
+                'sample_rate': librosa.get_samplerate(str(file_path)),
+                'duration': librosa.get_duration(path=str(file_path))
             }
+            if self.spectral_features:
+                analysis.update(self._decoded_audio_features(file_path))
+            return analysis
         except Exception as e:
             return {'error': f'Audio analysis failed: {e}'}
     
+    def _decoded_audio_features(self, file_path: Path) -> Dict[str, Any]:
+        """Audio features for formats soundfile can't stream, decoding the whole file at its native rate."""
+        y, sr = load_backend('librosa').load(str(file_path), sr=None)
+        features = AudioFeatureAccumulator(sr)
+        block_size = AUDIO_FRAME_LENGTH * AUDIO_BLOCK_FRAMES
+        for start in range(0, len(y), block_size):
+            features.add(y[start:start + block_size])
+        return features.result()
+    
     def analyze_multiple_files(self, file_paths: List[str]) -> Dict[str, Any]:
         """Analyze multiple files and return summary statistics."""
         analyses = []
         errors = []
         
-        for file_path in file_paths:
-            analysis = self.analyze_file(file_path)
+        for file_path, analysis in zip(file_paths, self.analyze_files(file_paths)):
             if 'error' in analysis:
                 errors.append({'file': file_path, 'error': analysis['error']})
             else:
@@ -164,20 +431,165 @@ class MediaAnalyzer:
         
         # Calculate statistics
         total_size = sum(a.get('size', 0) for a in analyses)
+        duplicates = self.find_duplicates(analyses)
         
         return {
             'total_files': len(analyses),
             'total_errors': len(errors),
             'total_size': total_size,
             'by_type': {k: len(v) for k, v in by_type.items()},
+            'duplicates': duplicates,
             'analyses': analyses,
             'errors': errors
         }
     
     def get_supported_formats(self) -> Dict[str, List[str]]:
-        """Get list of supported file formats."""
+        """
+        Get list of file formats that can be analyzed with the installed
+        backends, checked without importing any of them.
+        """
+        installed = {name for name in BACKEND_MODULES if backend_installed(name)}
+        videos = self.supported_video_formats if 'cv2' in installed else HEADER_PROBED_VIDEO_FORMATS
+        return {
+            'images': sorted(self.supported_image_formats) if 'PIL' in installed else [],
+            'videos': sorted(videos),
+            'audio': sorted(self.supported_audio_formats) if installed & {'soundfile', 'librosa'} else [],
+            'backends': sorted(installed)
+        }
+
+
+def _image_thumbnail(img):
+    """
+    Small RGB copy of an image, decoded as little as possible: JPEGs are
+    decoded at up to 1/8 scale with draft(), other formats are shrunk with
+    reduce() right after decoding.
+    """
+    width, height = img.size
+    scale = max(1, min(8, min(width, height) // IMAGE_FEATURE_SIZE))
+    img.draft('RGB', (width // scale, height // scale))
+    
+    if img.mode not in ('L', 'RGB', 'RGBA') or 'transparency' in img.info:
+        # reduce() would average palette indices, and rejects 1-bit and 16-bit modes
+        has_alpha = 'A' in img.mode or 'a' in img.mode or 'transparency' in img.info
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+    
+    factor = min(img.size) // IMAGE_FEATURE_SIZE
+    if factor > 1:
+        img = img.reduce(factor)
+    if img.mode == 'RGBA':
+        # Judge transparent images against white, as they are usually shown
+        Image = load_backend('PIL')
+        background = Image.new('RGBA', img.size, (255, 255, 255, 255))
+        return Image.alpha_composite(background, img).convert('RGB')
+    return img.convert('RGB')
+
+
+def _image_features(thumbnail, header: Dict[str, Any]) -> Dict[str, Any]:
+    """Color histogram, dominant colors, brightness and a screenshot guess from an RGB thumbnail."""
+    pixels = np.asarray(thumbnail, dtype=np.uint8).reshape(-1, 3)
+    count = len(pixels)
+    
+    histogram = np.stack([np.bincount(pixels[:, c] >> 5, minlength=8) for c in range(3)]) / count
+    
+    # Dominant colors on a 16-level-per-channel palette
+    quantized = (pixels >> 4).astype(np.int32)
+    codes = (quantized[:, 0] << 8) | (quantized[:, 1] << 4) | quantized[:, 2]
+    counts = np.bincount(codes, minlength=4096)
+    top = np.argsort(counts)[::-1][:DOMINANT_COLORS]
+    top = top[counts[top] > 0]
+    dominant = [
+        {'color': '#{:02x}{:02x}{:02x}'.format(*(((code >> shift) & 0xF) * 17 for shift in (8, 4, 0))),
+         'share': round(float(counts[code]) / count, 4)}
+        for code in top
+    ]
+    
+    luma = pixels @ np.array([0.299, 0.587, 0.114]) / 255.0
+    
+    # Screenshots are mostly flat UI areas in a handful of colors; photos are neither
+    image = np.asarray(thumbnail, dtype=np.int16)
+    flat_ratio = float(np.mean(np.abs(np.diff(image, axis=1)).max(axis=2) <= 2)) if image.shape[1] > 1 else 0.0
+    coverage = sum(color['share'] for color in dominant)
+    # JPEG artifacts break up flat areas, so JPEGs need to be almost entirely flat
+    if header.get('format') == 'JPEG':
+        is_screenshot = flat_ratio >= 0.85
+    else:
+        is_screenshot = flat_ratio >= SCREENSHOT_FLAT_RATIO and coverage >= SCREENSHOT_COLOR_COVERAGE
+    
+    return {
+        'color_histogram': {channel: [round(float(v), 4) for v in histogram[i]] for i, channel in enumerate('rgb')},
+        'dominant_colors': dominant,
+        'brightness': round(float(luma.mean()), 4),
+        'contrast': round(float(luma.std()), 4),
+        'flat_ratio': round(flat_ratio, 4),
+        'is_screenshot': is_screenshot
+    }
+
+
+class AudioFeatureAccumulator:
+    """Running RMS energy, spectral centroid and silence ratio over blocks of mono samples."""
+    
+    def __init__(self, sample_rate: int):
+        self.window = np.hanning(AUDIO_FRAME_LENGTH).astype(np.float32)
+        self.frequencies = np.fft.rfftfreq(AUDIO_FRAME_LENGTH, 1.0 / sample_rate).astype(np.float32)
+        self.silence_rms = 10 ** (SILENCE_THRESHOLD_DB / 20)
+        self.samples = 0
+        self.sum_squares = 0.0
+        self.frames = 0
+        self.silent_frames = 0
+        self.centroid_sum = 0.0
+        self.centroid_frames = 0
+    
+    def add(self, block: np.ndarray):
+        """Fold in the next block of samples; only a final block may end in a partial frame."""
+        if not len(block):
+            return
+        block = np.asarray(block, dtype=np.float32)
+        self.samples += len(block)
+        self.sum_squares += float(np.dot(block, block))
+        
+        remainder = len(block) % AUDIO_FRAME_LENGTH
+        if remainder:
+            block = np.concatenate([block, np.zeros(AUDIO_FRAME_LENGTH - remainder, dtype=np.float32)])
+        frames = block.reshape(-1, AUDIO_FRAME_LENGTH)
+        
+        frame_rms = np.sqrt(np.mean(frames ** 2, axis=1))
+        self.frames += len(frames)
+        self.silent_frames += int(np.count_nonzero(frame_rms < self.silence_rms))
+        
+        magnitudes = np.abs(np.fft.rfft(frames * self.window, axis=1))
+        totals = magnitudes.sum(axis=1)
+        voiced = totals > 0
+        if voiced.any():
+            centroids = (magnitudes[voiced] @ self.frequencies) / totals[voiced]
+            self.centroid_sum += float(centroids.sum())
+            self.centroid_frames += int(voiced.sum())
+    
+    def result(self) -> Dict[str, Any]:
         return {
-            'images': list(self.supported_image_formats),
-            'videos': list(self.supported_video_formats),
-            'audio': list(self.supported_audio_formats)
+            'rms_energy': float(np.sqrt(self.sum_squares / self.samples)) if self.samples else 0.0,
+            'spectral_centroid': self.centroid_sum / self.centroid_frames if self.centroid_frames else 0.0,
+            'silence_ratio': round(self.silent_frames / self.frames, 4) if self.frames else 1.0
         }
+
+
+def _stream_audio_features(sound_file) -> Dict[str, Any]:
+    """Audio features of an open soundfile.SoundFile, read block by block and mixed down to mono."""
+    features = AudioFeatureAccumulator(sound_file.samplerate)
+    for block in sound_file.blocks(blocksize=AUDIO_FRAME_LENGTH * AUDIO_BLOCK_FRAMES,
+                                   dtype='float32', always_2d=True):
+        features.add(block.mean(axis=1))
+    return features.result()
+
+
+def _analyze_media_batch(files_directory: str, options: Dict[str, Any], file_paths: List[str]) -> List[Dict[str, Any]]:
+    """Process pool entry point: analyze a batch of media files."""
+    analyzer = MediaAnalyzer(files_directory, **options)
+    return [analyzer.analyze_file(file_path) for file_path in file_paths]
+
+
+def _try_content_hash(file_path: str) -> Optional[str]:
+    """Content hash of a file, or None if it can't be read."""
+    try:
+        return content_hash(file_path)
+    except OSError:
+        return None
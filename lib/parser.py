@@ -1,39 +1,568 @@
 """
-Discord HTML Parser
-Extracts chat messages and metadata from Discord HTML exports.
+Discord Export Parsers
+Extracts chat messages and metadata from Discord HTML and JSON exports.
 """
 
+import os
 import re
-from typing import List, Optional, Dict, Any
-from dataclasses import dataclass
+import sys
+import json
+import time
+import heapq
+import calendar
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from functools import lru_cache
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from html.parser import HTMLParser
+from typing import List, Optional, Dict, Any, Iterator, Iterable, NamedTuple, Sequence
 from bs4 import BeautifulSoup
 
+# Bytes read from the export per iteration in streaming mode
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+_MESSAGES_ARRAY_RE = re.compile(r'"messages"\s*:\s*\[')
+_SEPARATOR_RE = re.compile(r'[\s,]*')
+
+# Discord snowflakes carry their creation time in ms since 2015-01-01 UTC
+DISCORD_EPOCH_MS = 1420070400000
+
+# JSON message types written by people; every other type is a system notice
+USER_MESSAGE_TYPES = frozenset(('Default', 'Reply', 'ThreadStarterMessage', 'ChatInputCommand', 'ContextMenuCommand'))
+
+# ISO 8601 as written by the JSON exporter, e.g. 2023-01-05T18:42:07.123+00:00
+_ISO_TIMESTAMP_RE = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d)(?::(\d\d)(?:\.(\d+))?)?\s*(Z|[+-]\d\d:?\d\d)?$'
+)
+
+# Title attribute layouts used by the HTML exporter over the years
+_HTML_TIMESTAMP_FORMATS = (
+    '%A, %B %d, %Y %I:%M %p',   # Sunday, June 15, 2009 1:45 PM
+    '%d-%b-%y %I:%M %p',        # 15-Jun-09 01:45 PM
+    '%m/%d/%Y %I:%M %p',        # 06/15/2009 1:45 PM
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+)
+# Exports use one layout throughout, so the last one that matched is tried
+# first. Replaced with a single assignment, so threads never see it half-updated
+_last_html_format = _HTML_TIMESTAMP_FORMATS[0]
+
+
+def snowflake_to_ms(snowflake: str) -> int:
+    """Epoch milliseconds encoded in a Discord snowflake ID, or 0."""
+    if not snowflake.isdigit():
+        return 0
+    offset = int(snowflake) >> 22
+    return offset + DISCORD_EPOCH_MS if offset else 0
+
+
+@lru_cache(maxsize=65536)
+def parse_timestamp(value: str) -> int:
+    """
+    Convert an exported timestamp string to epoch milliseconds (0 if unknown).
+    
+    ISO strings are decoded with a regex and integer arithmetic; the HTML
+    layouts go through strptime, trying the last format that matched first.
+    Timestamps without an offset are treated as UTC.
+    """
+    if not value:
+        return 0
+    value = value.strip()
+    
+    match = _ISO_TIMESTAMP_RE.match(value)
+    if match:
+        year, month, day, hour, minute, second, fraction, offset = match.groups()
+        seconds = calendar.timegm((int(year), int(month), int(day), int(hour), int(minute), int(second or 0)))
+        millis = int((fraction or '0')[:3].ljust(3, '0'))
+        if offset and offset != 'Z':
+            sign = -1 if offset[0] == '-' else 1
+            digits = offset[1:].replace(':', '')
+            seconds -= sign * (int(digits[:2]) * 3600 + int(digits[2:]) * 60)
+        return seconds * 1000 + millis
+    
+    global _last_html_format
+    last = _last_html_format
+    for fmt in (last,) + _HTML_TIMESTAMP_FORMATS:
+        try:
+            parsed = time.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt != last:
+            _last_html_format = fmt
+        return calendar.timegm(parsed) * 1000
+    
+    return 0
+
+
+def format_timestamp(timestamp_ms: int, fmt: str = '%Y-%m-%d %H:%M') -> str:
+    """Format epoch milliseconds as UTC text for prompts and reports."""
+    if not timestamp_ms:
+        return 'Unknown time'
+    return time.strftime(fmt, time.gmtime(timestamp_ms / 1000))
+
+
+class Reaction(NamedTuple):
+    """A reaction emoji and the number of users who added it."""
+    emoji: str
+    count: int
+
 
-@dataclass
 class ChatMessage:
-    """Represents a single chat message with all its metadata."""
-    message_id: str
-    author: str
-    author_id: str
-    timestamp: str
-    content: str
-    attachments: List[str]
-    reactions: List[Dict[str, Any]]
-    reply_to: Optional[str] = None
-    edited: bool = False
-    edited_timestamp: Optional[str] = None
-
-
-class DiscordHTMLParser:
+    """
+    Represents a single chat message with all its metadata.
+    
+    Slotted rather than a dataclass so millions of messages don't each carry
+    a __dict__; author names and IDs are interned so repeated authors share
+    one string, and attachments/reactions are stored as tuples.
+    
+    timestamp keeps the exported text, timestamp_ms the normalized epoch
+    milliseconds used for sorting and bucketing. It is taken from the
+    snowflake ID when there is one (exact and timezone-safe, unlike the HTML
+    title text) and parsed from the string otherwise.
+    
+    is_bot marks messages from bot accounts and is_system Discord's own
+    notices (joins, pins, thread creation and the like).
+    """
+    
+    __slots__ = (
+        'message_id', 'author', 'author_id', 'timestamp', 'content',
+        'attachments', 'reactions', 'reply_to', 'edited', 'edited_timestamp',
+        'timestamp_ms', 'is_bot', 'is_system'
+    )
+    
+    def __init__(self, message_id: str, author: str, author_id: str, timestamp: str, content: str,
+                 attachments: Sequence[str] = (), reactions: Sequence[Reaction] = (),
+                 reply_to: Optional[str] = None, edited: bool = False,
+                 edited_timestamp: Optional[str] = None, timestamp_ms: Optional[int] = None,
+                 is_bot: bool = False, is_system: bool = False):
+        self.message_id = message_id
+        self.author = sys.intern(author)
+        self.author_id = sys.intern(author_id)
+        self.timestamp = timestamp
+        self.content = content
+        self.attachments = tuple(attachments) if attachments else ()
+        self.reactions = tuple(reactions) if reactions else ()
+        self.reply_to = reply_to
+        self.edited = edited
+        self.edited_timestamp = edited_timestamp
+        if timestamp_ms is None:
+            timestamp_ms = snowflake_to_ms(message_id) or parse_timestamp(timestamp)
+        self.timestamp_ms = timestamp_ms
+        self.is_bot = is_bot
+        self.is_system = is_system
+    
+    def astuple(self) -> tuple:
+        """Return the field values in declaration order."""
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __reduce__(self):
+        # Rebuild through __init__ so author strings are re-interned after pickling
+        return (ChatMessage, self.astuple())
+    
+    def __eq__(self, other):
+        if not isinstance(other, ChatMessage):
+            return NotImplemented
+        return self.astuple() == other.astuple()
+    
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"ChatMessage({fields})"
+
+
+class MessageStore:
+    """
+    Columnar container for large numbers of messages.
+    
+    Message IDs, epoch-ms timestamps, author indices and content offsets
+    live in flat arrays, all
+    message text is kept in a single string, and the rarely populated fields
+    (attachments, reactions, replies, edits) are stored sparsely by position,
+    with per-message booleans packed into bytearrays.
+    Indexing or iterating yields ChatMessage records built on demand, and the
+    column helpers let callers read authors or timestamps without building
+    any per-message objects.
+    """
+    
+    def __init__(self):
+        self._message_ids = array('Q')
+        self._timestamps = []
+        self._timestamps_ms = array('q')
+        self._author_index = array('I')
+        self._authors = []
+        self._author_lookup = {}
+        self._content_offsets = array('Q', [0])
+        self._content_parts = []
+        self._content = ''
+        self._attachments = {}
+        self._reactions = {}
+        self._reply_to = {}
+        self._edited = bytearray()
+        self._edited_timestamps = {}
+        self._bots = bytearray()
+        self._system = bytearray()
+    
+    @classmethod
+    def from_messages(cls, messages: Iterable[ChatMessage]) -> 'MessageStore':
+        """Build a store from any iterable of messages (e.g. a streaming parser)."""
+        store = cls()
+        for message in messages:
+            store.append(message)
+        return store
+    
+    def append(self, message: ChatMessage):
+        """Add a message to the end of the store."""
+        position = len(self._message_ids)
+        
+        self._message_ids.append(int(message.message_id) if message.message_id.isdigit() else 0)
+        self._timestamps.append(message.timestamp)
+        self._timestamps_ms.append(message.timestamp_ms)
+        
+        author_key = (message.author, message.author_id)
+        author_idx = self._author_lookup.get(author_key)
+        if author_idx is None:
+            author_idx = len(self._authors)
+            self._authors.append(author_key)
+            self._author_lookup[author_key] = author_idx
+        self._author_index.append(author_idx)
+        
+        self._content_parts.append(message.content)
+        self._content_offsets.append(self._content_offsets[-1] + len(message.content))
+        
+        if message.attachments:
+            self._attachments[position] = tuple(message.attachments)
+        if message.reactions:
+            self._reactions[position] = tuple(message.reactions)
+        if message.reply_to:
+            self._reply_to[position] = message.reply_to
+        self._edited.append(1 if message.edited else 0)
+        if message.edited_timestamp:
+            self._edited_timestamps[position] = message.edited_timestamp
+        self._bots.append(1 if message.is_bot else 0)
+        self._system.append(1 if message.is_system else 0)
+    
+    def __len__(self) -> int:
+        return len(self._message_ids)
+    
+    def __bool__(self) -> bool:
+        return len(self) > 0
+    
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._build(i) for i in range(*key.indices(len(self)))]
+        
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('MessageStore index out of range')
+        return self._build(key)
+    
+    def __iter__(self) -> Iterator[ChatMessage]:
+        for position in range(len(self)):
+            yield self._build(position)
+    
+    def __getstate__(self):
+        self._flush_content()
+        state = self.__dict__.copy()
+        del state['_author_lookup']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._author_lookup = {key: idx for idx, key in enumerate(self._authors)}
+    
+    @property
+    def participants(self) -> List[str]:
+        """Distinct author names in order of first appearance."""
+        return list(dict.fromkeys(name for name, _ in self._authors))
+    
+    def iter_authors(self) -> Iterator[str]:
+        """Yield each message's author name without building message objects."""
+        authors = self._authors
+        for idx in self._author_index:
+            yield authors[idx][0]
+    
+    def iter_timestamps(self) -> Iterator[str]:
+        """Yield each message's timestamp without building message objects."""
+        return iter(self._timestamps)
+    
+    def iter_contents(self) -> Iterator[str]:
+        """Yield each message's text without building message objects."""
+        self._flush_content()
+        content = self._content
+        offsets = self._content_offsets
+        for position in range(len(self)):
+            yield content[offsets[position]:offsets[position + 1]]
+    
+    def iter_attachments(self) -> Iterator[tuple]:
+        """Yield each message's attachments (usually empty) without building message objects."""
+        attachments = self._attachments
+        for position in range(len(self)):
+            yield attachments.get(position, ())
+    
+    @property
+    def timestamps_ms(self) -> array:
+        """Epoch-millisecond timestamps of all messages as an int64 array."""
+        return self._timestamps_ms
+    
+    def timestamps_ms_array(self):
+        """Zero-copy NumPy int64 view of the epoch-millisecond timestamps."""
+        import numpy as np
+        return np.frombuffer(self._timestamps_ms, dtype=np.int64)
+    
+    def _flush_content(self):
+        if self._content_parts:
+            self._content = self._content + ''.join(self._content_parts)
+            self._content_parts = []
+    
+    def _build(self, position: int) -> ChatMessage:
+        self._flush_content()
+        message_id = self._message_ids[position]
+        author, author_id = self._authors[self._author_index[position]]
+        start = self._content_offsets[position]
+        end = self._content_offsets[position + 1]
+        
+        return ChatMessage(
+            message_id=str(message_id) if message_id else '',
+            author=author,
+            author_id=author_id,
+            timestamp=self._timestamps[position],
+            content=self._content[start:end],
+            attachments=self._attachments.get(position, ()),
+            reactions=self._reactions.get(position, ()),
+            reply_to=self._reply_to.get(position),
+            edited=bool(self._edited[position]),
+            edited_timestamp=self._edited_timestamps.get(position),
+            timestamp_ms=self._timestamps_ms[position],
+            is_bot=bool(self._bots[position]),
+            is_system=bool(self._system[position])
+        )
+
+
+class _MessageContainerScanner(HTMLParser):
+    """
+    Incrementally scans HTML and collects the raw markup of every
+    chatlog__message-container div as soon as its closing tag is seen.
+    Only the container currently being read is held in memory.
+    """
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.completed = []
+        self._parts = None
+        self._div_depth = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if self._parts is None:
+            if tag != 'div':
+                return
+            classes = (dict(attrs).get('class') or '').split()
+            if 'chatlog__message-container' not in classes:
+                return
+            self._parts = []
+            self._div_depth = 0
+        
+        self._parts.append(self.get_starttag_text())
+        if tag == 'div':
+            self._div_depth += 1
+    
+    def handle_startendtag(self, tag, attrs):
+        if self._parts is not None:
+            self._parts.append(self.get_starttag_text())
+    
+    def handle_endtag(self, tag):
+        if self._parts is None:
+            return
+        
+        self._parts.append(f'</{tag}>')
+        if tag == 'div':
+            self._div_depth -= 1
+            if self._div_depth == 0:
+                self.completed.append(''.join(self._parts))
+                self._parts = None
+    
+    def handle_data(self, data):
+        if self._parts is not None:
+            self._parts.append(data)
+    
+    def handle_entityref(self, name):
+        if self._parts is not None:
+            self._parts.append(f'&{name};')
+    
+    def handle_charref(self, name):
+        if self._parts is not None:
+            self._parts.append(f'&#{name};')
+    
+    def drain(self) -> List[str]:
+        """Return and forget the containers completed so far."""
+        completed, self.completed = self.completed, []
+        return completed
+
+
+class ConversationIndex:
+    """
+    Indexes over a parsed conversation, built in a single pass so every
+    analysis stage can share them instead of rescanning the messages.
+    
+    - author_postings: author name -> positions of their messages
+    - time_order / sorted_ms: message positions sorted chronologically and
+      their epoch-ms timestamps, for integer range queries
+    - reply_children / reply_parent: reply graph between message positions
+    """
+    
+    def __init__(self, messages: Sequence[ChatMessage]):
+        self.messages = messages
+        self.author_postings = {}
+        self.position_by_id = {}
+        self.reply_children = {}
+        self.reply_parent = {}
+        self.total_attachments = 0
+        self.total_reactions = 0
+        self.edited_messages = 0
+        
+        sort_keys = array('q')
+        pending_replies = []
+        
+        for position, msg in enumerate(messages):
+            postings = self.author_postings.get(msg.author)
+            if postings is None:
+                postings = self.author_postings[msg.author] = array('I')
+            postings.append(position)
+            
+            if msg.message_id:
+                self.position_by_id[msg.message_id] = position
+            if msg.reply_to:
+                pending_replies.append((position, msg.reply_to))
+            
+            sort_keys.append(message_sort_key(msg))
+            self.total_attachments += len(msg.attachments)
+            self.total_reactions += len(msg.reactions)
+            if msg.edited:
+                self.edited_messages += 1
+        
+        # Replies can only be resolved once every message ID has been seen
+        for position, parent_id in pending_replies:
+            parent = self.position_by_id.get(parent_id)
+            if parent is not None:
+                self.reply_parent[position] = parent
+                self.reply_children.setdefault(parent, []).append(position)
+        
+        self.time_order = array('I', sorted(range(len(sort_keys)), key=sort_keys.__getitem__))
+        self.sorted_ms = array('q', (sort_keys[i] for i in self.time_order))
+    
+    @property
+    def participants(self) -> List[str]:
+        """Distinct author names in order of first appearance."""
+        return list(self.author_postings)
+    
+    @property
+    def date_range(self) -> tuple:
+        """Timestamps of the earliest and latest message."""
+        if not self.time_order:
+            return ('', '')
+        return (self.messages[self.time_order[0]].timestamp, self.messages[self.time_order[-1]].timestamp)
+    
+    @property
+    def time_range_ms(self) -> tuple:
+        """Epoch-ms timestamps of the earliest and latest message."""
+        if not self.sorted_ms:
+            return (0, 0)
+        return (self.sorted_ms[0], self.sorted_ms[-1])
+    
+    def positions_between(self, start_ms: int, end_ms: int) -> array:
+        """Positions of messages sent in [start_ms, end_ms), in chronological order."""
+        lo = bisect_left(self.sorted_ms, start_ms)
+        hi = bisect_left(self.sorted_ms, end_ms)
+        return self.time_order[lo:hi]
+    
+    def bucket_counts(self, bucket_ms: int = 86400000) -> Dict[int, int]:
+        """Message counts per time bucket (bucket start in epoch ms), one day by default."""
+        counts = {}
+        for ms in self.sorted_ms:
+            if ms:
+                bucket = ms - ms % bucket_ms
+                counts[bucket] = counts.get(bucket, 0) + 1
+        return counts
+    
+    def message_counts(self) -> Dict[str, int]:
+        """Number of messages sent by each participant."""
+        return {author: len(postings) for author, postings in self.author_postings.items()}
+    
+    def messages_by(self, author: str) -> List[ChatMessage]:
+        """All messages sent by one participant, in export order."""
+        return [self.messages[i] for i in self.author_postings.get(author, ())]
+    
+    def reply_counts(self) -> Dict[tuple, int]:
+        """Number of replies between participants, keyed by (replier, replied_to)."""
+        counts = {}
+        for position, parent in self.reply_parent.items():
+            key = (self.messages[position].author, self.messages[parent].author)
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+class DiscordExportParser(ABC):
+    """Base class for parsers of DiscordChatExporter output files."""
+    
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.messages = []
+        self.index = None
+    
+    def parse(self) -> List[ChatMessage]:
+        """Parse the export file and extract all messages."""
+        self.messages = list(self.iter_messages())
+        return self.messages
+    
+    def parse_compact(self) -> MessageStore:
+        """Parse the export file straight into a columnar MessageStore."""
+        self.messages = MessageStore.from_messages(self.iter_messages())
+        return self.messages
+    
+    @abstractmethod
+    def iter_messages(self) -> Iterator[ChatMessage]:
+        """Yield messages from the export file one at a time."""
+    
+    def get_index(self) -> ConversationIndex:
+        """Return the index for the parsed messages, building it on first use."""
+        if self.index is None or self.index.messages is not self.messages:
+            self.index = ConversationIndex(self.messages)
+        return self.index
+    
+    def get_conversation_stats(self) -> Dict[str, Any]:
+        """Get basic statistics about the parsed conversation."""
+        if not self.messages:
+            return {}
+        
+        index = self.get_index()
+        
+        return {
+            'total_messages': len(self.messages),
+            'participants': index.participants,
+            'participant_message_counts': index.message_counts(),
+            'date_range': index.date_range,
+            'time_range_ms': index.time_range_ms,
+            'daily_message_counts': index.bucket_counts(),
+            'total_attachments': index.total_attachments,
+            'total_reactions': index.total_reactions,
+            'edited_messages': index.edited_messages
+        }
+
+
+class DiscordHTMLParser(DiscordExportParser):
     """Parses Discord HTML export files to extract chat data."""
     
-    def __init__(self, html_file_path: str):
+    def __init__(self, html_file_path: str, streaming: bool = True):
+        super().__init__(html_file_path)
         self.html_file_path = html_file_path
+        self.streaming = streaming
         self.soup = None
-        self.messages = []
         
     def parse(self) -> List[ChatMessage]:
         """Parse the HTML file and extract all messages."""
+        if self.streaming:
+            return super().parse()
+        
         with open(self.html_file_path, 'r', encoding='utf-8') as f:
             content = f.read()
         
@@ -41,6 +570,36 @@ class DiscordHTMLParser:
         self._extract_messages()
         return self.messages
     
+    def iter_messages(self, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[ChatMessage]:
+        """
+        Stream messages from the HTML file without building a full document tree.
+        
+        The file is read in chunks and each message container is parsed on its
+        own as soon as it closes, so memory use does not grow with file size.
+        """
+        scanner = _MessageContainerScanner()
+        
+        with open(self.html_file_path, 'r', encoding='utf-8') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                scanner.feed(chunk)
+                yield from self._parse_fragments(scanner.drain())
+        
+        scanner.close()
+        yield from self._parse_fragments(scanner.drain())
+    
+    def _parse_fragments(self, fragments: List[str]) -> Iterator[ChatMessage]:
+        """Parse raw message container markup into ChatMessage objects."""
+        for fragment in fragments:
+            container = BeautifulSoup(fragment, 'html.parser').find('div', class_='chatlog__message-container')
+            if container is None:
+                continue
+            message = self._parse_message_container(container)
+            if message:
+                yield message
+    
     def _extract_messages(self):
         """Extract messages from the parsed HTML."""
         message_groups = self.soup.find_all('div', class_='chatlog__message-group')
@@ -68,6 +627,8 @@ class DiscordHTMLParser:
             author_span = message_div.find('span', class_='chatlog__author')
             author = author_span.text.strip() if author_span else 'Unknown'
             author_id = author_span.get('data-user-id', '') if author_span else ''
+            is_bot = message_div.find('span', class_='chatlog__bot-label') is not None
+            is_system = message_div.find(class_='chatlog__system-notification-content') is not None
             
             # Extract timestamp
             timestamp_span = message_div.find('span', class_='chatlog__timestamp')
@@ -110,7 +671,9 @@ class DiscordHTMLParser:
                 reactions=reactions,
                 reply_to=reply_to,
                 edited=edited,
-                edited_timestamp=edited_timestamp
+                edited_timestamp=edited_timestamp,
+                is_bot=is_bot,
+                is_system=is_system
             )
             
         except Exception as e:
@@ -162,7 +725,7 @@ class DiscordHTMLParser:
         
         return attachments
     
-    def _extract_reactions(self, message_div) -> List[Dict[str, Any]]:
+    def _extract_reactions(self, message_div) -> List[Reaction]:
         """Extract reactions from message."""
         reactions = []
         reactions_div = message_div.find_all('div', class_='chatlog__reactions')
@@ -186,35 +749,170 @@ class DiscordHTMLParser:
                         pass
                 
                 if emoji:
-                    reactions.append({'emoji': emoji, 'count': count})
+                    reactions.append(Reaction(emoji, count))
         
         return reactions
+
+
+class DiscordJSONParser(DiscordExportParser):
+    """
+    Parses DiscordChatExporter JSON exports.
     
-    def get_conversation_stats(self) -> Dict[str, Any]:
-        """Get basic statistics about the parsed conversation."""
-        if not self.messages:
-            return {}
+    The top-level "messages" array is decoded one object at a time from a
+    sliding buffer, so large exports never have to be loaded as a whole.
+    """
+    
+    def iter_messages(self, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[ChatMessage]:
+        """Stream messages from the JSON file with an incremental decoder."""
+        decoder = json.JSONDecoder()
         
-        participants = list(set(msg.author for msg in self.messages))
-        timestamps = [msg.timestamp for msg in self.messages if msg.timestamp]
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            buffer = ''
+            
+            # Skip the guild/channel header up to the start of the messages array
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                buffer += chunk
+                match = _MESSAGES_ARRAY_RE.search(buffer)
+                if match:
+                    buffer = buffer[match.end():]
+                    break
+                # Keep a short tail in case the key is split across reads
+                buffer = buffer[-64:]
+            
+            pos = 0
+            while True:
+                pos = _SEPARATOR_RE.match(buffer, pos).end()
+                
+                if pos < len(buffer) and buffer[pos] == ']':
+                    return
+                
+                try:
+                    obj, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        raise ValueError(f"Truncated or malformed JSON export: {self.file_path}")
+                    buffer = buffer[pos:] + chunk
+                    pos = 0
+                    continue
+                
+                message = self._parse_message(obj)
+                if message:
+                    yield message
+    
+    def _parse_message(self, obj: Dict[str, Any]) -> Optional[ChatMessage]:
+        """Convert a single exported message object into a ChatMessage."""
+        if not isinstance(obj, dict):
+            return None
         
-        # Count messages by participant
-        message_counts = {}
-        for msg in self.messages:
-            message_counts[msg.author] = message_counts.get(msg.author, 0) + 1
+        author = obj.get('author') or {}
+        reference = obj.get('reference') or {}
         
-        # Count attachments
-        total_attachments = sum(len(msg.attachments) for msg in self.messages)
+        attachments = []
+        for attachment in obj.get('attachments') or []:
+            path = attachment.get('url') or attachment.get('fileName')
+            if path:
+                attachments.append(path)
         
-        # Count reactions
-        total_reactions = sum(len(msg.reactions) for msg in self.messages)
+        reactions = []
+        for reaction in obj.get('reactions') or []:
+            emoji = reaction.get('emoji') or {}
+            name = emoji.get('name') or emoji.get('code') or ''
+            if name:
+                reactions.append(Reaction(name, int(reaction.get('count') or 0)))
         
-        return {
-            'total_messages': len(self.messages),
-            'participants': participants,
-            'participant_message_counts': message_counts,
-            'date_range': (min(timestamps), max(timestamps)) if timestamps else ('', ''),
-            'total_attachments': total_attachments,
-            'total_reactions': total_reactions,
-            'edited_messages': sum(1 for msg in self.messages if msg.edited)
-        }
+        edited_timestamp = obj.get('timestampEdited')
+        
+        return ChatMessage(
+            message_id=str(obj.get('id', '')),
+            author=author.get('nickname') or author.get('name') or 'Unknown',
+            author_id=str(author.get('id', '')),
+            timestamp=obj.get('timestamp') or '',
+            content=obj.get('content') or '',
+            attachments=attachments,
+            reactions=reactions,
+            reply_to=reference.get('messageId'),
+            edited=bool(edited_timestamp),
+            edited_timestamp=edited_timestamp,
+            is_bot=bool(author.get('isBot')),
+            is_system=obj.get('type', 'Default') not in USER_MESSAGE_TYPES
+        )
+
+
+class DiscordDirectoryParser(DiscordExportParser):
+    """
+    Parses every channel export in a directory (e.g. an exportguild output)
+    on a process pool and merges the results into one timeline.
+    """
+    
+    def __init__(self, directory: str, max_workers: Optional[int] = None):
+        super().__init__(directory)
+        self.directory = directory
+        self.max_workers = max_workers
+    
+    def get_export_files(self) -> List[str]:
+        """List the channel export files contained in the directory."""
+        return find_export_files(self.directory, recursive=False)
+    
+    def iter_messages(self) -> Iterator[ChatMessage]:
+        """Parse all channel files in parallel and yield messages in timestamp order."""
+        export_files = self.get_export_files()
+        if not export_files:
+            return
+        
+        print(f"Parsing {len(export_files)} channel exports...")
+        channel_messages = []
+        
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(_parse_export_file, path): path for path in export_files}
+            
+            for done, future in enumerate(as_completed(futures), 1):
+                name = os.path.basename(futures[future])
+                try:
+                    messages = future.result()
+                except Exception as e:
+                    print(f"[{done}/{len(export_files)}] Error parsing {name}: {e}")
+                    continue
+                
+                print(f"[{done}/{len(export_files)}] {name}: {len(messages)} messages")
+                channel_messages.append(messages)
+        
+        yield from heapq.merge(*channel_messages, key=message_sort_key)
+
+
+def message_sort_key(message: ChatMessage) -> int:
+    """Chronological sort key: the message's epoch-ms timestamp."""
+    return message.timestamp_ms
+
+
+def _parse_export_file(file_path: str) -> List[ChatMessage]:
+    """Process pool entry point: parse one export file into sorted messages."""
+    messages = create_parser(file_path).parse()
+    messages.sort(key=message_sort_key)
+    return messages
+
+
+def find_export_files(directory: str, recursive: bool = True) -> List[str]:
+    """Find HTML and JSON channel exports, skipping our own analysis results."""
+    export_files = []
+    for root, dirs, files in os.walk(directory):
+        for file in sorted(files):
+            if file.startswith('analysis_'):
+                continue
+            if file.endswith(('.html', '.json')):
+                export_files.append(os.path.join(root, file))
+        if not recursive:
+            break
+    return export_files
+
+
+def create_parser(file_path: str) -> DiscordExportParser:
+    """Return the parser matching the export file's format, or a directory parser."""
+    if os.path.isdir(file_path):
+        return DiscordDirectoryParser(file_path)
+    if os.path.splitext(file_path)[1].lower() == '.json':
+        return DiscordJSONParser(file_path)
+    return DiscordHTMLParser(file_path)
@@ -0,0 +1,324 @@
+"""
+Video Container Probe
+Reads duration, resolution, frame rate and codec straight from MP4/MOV
+(ISO base media) and Matroska/WebM headers, without starting a decoder.
+"""
+
+import io
+import struct
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+# The movie header box is usually small; refuse to load absurdly large ones
+MAX_MOOV_BYTES = 64 * 1024 * 1024
+MAX_EBML_ELEMENT_BYTES = 16 * 1024 * 1024
+
+# ISO base media boxes whose children are boxes
+_MP4_CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+# Matroska element IDs
+_EBML = 0x1A45DFA3
+_DOC_TYPE = 0x4282
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TIMECODE_SCALE = 0x2AD7B1
+_DURATION = 0x4489
+_TRACKS = 0x1654AE6B
+_TRACK_ENTRY = 0xAE
+_TRACK_TYPE = 0x83
+_CODEC_ID = 0x86
+_DEFAULT_DURATION = 0x23E383
+_VIDEO = 0xE0
+_PIXEL_WIDTH = 0xB0
+_PIXEL_HEIGHT = 0xBA
+_CLUSTER = 0x1F43B675
+
+
+def probe_video(file_path: str) -> Optional[Dict[str, Any]]:
+    """Container metadata of a video file, or None if its container isn't recognized."""
+    with open(file_path, 'rb') as f:
+        magic = f.read(12)
+        f.seek(0)
+        if magic[:4] == struct.pack('>I', _EBML):
+            return _probe_matroska(f)
+        if magic[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide', b'skip'):
+            return _probe_mp4(f)
+    return None
+
+
+# -- ISO base media (MP4, MOV) -------------------------------------------------
+
+def _probe_mp4(f: BinaryIO) -> Optional[Dict[str, Any]]:
+    """Find the moov box among the top-level boxes and read its tracks."""
+    f.seek(0, 2)
+    file_size = f.tell()
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = _read_box_header(f, file_size - offset)
+        if header is None:
+            return None
+        box_type, header_size, box_size = header
+        if box_type == b'moov':
+            if box_size > MAX_MOOV_BYTES:
+                return None
+            return _parse_moov(f.read(box_size - header_size))
+        # Skip over media data (often most of the file) without reading it
+        offset += box_size
+    return None
+
+
+def _read_box_header(f: BinaryIO, remaining: int) -> Optional[Tuple[bytes, int, int]]:
+    header = f.read(8)
+    if len(header) < 8:
+        return None
+    size, box_type = struct.unpack('>I4s', header)
+    header_size = 8
+    if size == 1:
+        large = f.read(8)
+        if len(large) < 8:
+            return None
+        size = struct.unpack('>Q', large)[0]
+        header_size = 16
+    elif size == 0:
+        size = remaining
+    if size < header_size:
+        return None
+    return box_type, header_size, size
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """(type, payload start, payload end) of each box in data[start:end]."""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header_size = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            return
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def _find_boxes(data: bytes, start: int, end: int, path: Tuple[bytes, ...]) -> Iterator[Tuple[int, int]]:
+    """Payload ranges of the boxes at path below data[start:end]."""
+    for box_type, payload_start, payload_end in _iter_boxes(data, start, end):
+        if box_type != path[0]:
+            continue
+        if len(path) == 1:
+            yield payload_start, payload_end
+        elif box_type in _MP4_CONTAINERS:
+            yield from _find_boxes(data, payload_start, payload_end, path[1:])
+
+
+def _first_box(data: bytes, start: int, end: int, *path: bytes) -> Optional[Tuple[int, int]]:
+    return next(_find_boxes(data, start, end, path), None)
+
+
+def _parse_moov(moov: bytes) -> Optional[Dict[str, Any]]:
+    result: Dict[str, Any] = {'container': 'mp4', 'has_audio': False}
+    
+    mvhd = _first_box(moov, 0, len(moov), b'mvhd')
+    if mvhd:
+        start = mvhd[0]
+        if moov[start] == 1:
+            timescale, duration = struct.unpack_from('>IQ', moov, start + 20)
+        else:
+            timescale, duration = struct.unpack_from('>II', moov, start + 12)
+        if timescale:
+            result['duration'] = duration / timescale
+    
+    for trak_start, trak_end in _find_boxes(moov, 0, len(moov), (b'trak',)):
+        hdlr = _first_box(moov, trak_start, trak_end, b'mdia', b'hdlr')
+        handler = moov[hdlr[0] + 8:hdlr[0] + 12] if hdlr else b''
+        if handler == b'soun':
+            result['has_audio'] = True
+            continue
+        if handler != b'vide' or 'width' in result:
+            continue
+        result.update(_parse_video_trak(moov, trak_start, trak_end))
+    
+    return result if 'duration' in result or 'width' in result else None
+
+
+def _parse_video_trak(moov: bytes, start: int, end: int) -> Dict[str, Any]:
+    track: Dict[str, Any] = {}
+    
+    tkhd = _first_box(moov, start, end, b'tkhd')
+    if tkhd:
+        # Width and height are 16.16 fixed point at the end of the box
+        width, height = struct.unpack_from('>II', moov, tkhd[1] - 8)
+        track['width'] = width >> 16
+        track['height'] = height >> 16
+    
+    track_duration = None
+    mdhd = _first_box(moov, start, end, b'mdia', b'mdhd')
+    if mdhd:
+        payload = mdhd[0]
+        if moov[payload] == 1:
+            timescale, duration = struct.unpack_from('>IQ', moov, payload + 20)
+        else:
+            timescale, duration = struct.unpack_from('>II', moov, payload + 12)
+        if timescale:
+            track_duration = duration / timescale
+    
+    stsd = _first_box(moov, start, end, b'mdia', b'minf', b'stbl', b'stsd')
+    if stsd and stsd[1] - stsd[0] >= 16:
+        track['codec'] = moov[stsd[0] + 12:stsd[0] + 16].decode('latin-1').strip()
+    
+    stsz = _first_box(moov, start, end, b'mdia', b'minf', b'stbl', b'stsz')
+    if stsz:
+        track['frame_count'] = struct.unpack_from('>I', moov, stsz[0] + 8)[0]
+    if not track.get('frame_count'):
+        stts = _first_box(moov, start, end, b'mdia', b'minf', b'stbl', b'stts')
+        if stts:
+            entries = struct.unpack_from('>I', moov, stts[0] + 4)[0]
+            track['frame_count'] = sum(
+                struct.unpack_from('>I', moov, stts[0] + 8 + 8 * i)[0] for i in range(entries)
+            )
+    
+    if track_duration and track.get('frame_count'):
+        track['fps'] = track['frame_count'] / track_duration
+    return track
+
+
+# -- Matroska, WebM ------------------------------------------------------------
+
+def _probe_matroska(f: BinaryIO) -> Optional[Dict[str, Any]]:
+    """Read the EBML header, then Info and Tracks from the segment, stopping at the first cluster."""
+    element = _read_element_header(f)
+    if element is None or element[0] != _EBML:
+        return None
+    header = _read_payload(f, element[1])
+    doc_type = 'matroska'
+    for element_id, value in _iter_elements(header):
+        if element_id == _DOC_TYPE:
+            doc_type = value.decode('ascii', 'replace').strip('\x00')
+    
+    element = _read_element_header(f)
+    if element is None or element[0] != _SEGMENT:
+        return None
+    
+    result: Dict[str, Any] = {'container': doc_type, 'has_audio': False}
+    timecode_scale = 1000000
+    raw_duration = None
+    found_info = found_tracks = False
+    
+    while not (found_info and found_tracks):
+        element = _read_element_header(f)
+        if element is None:
+            break
+        element_id, size = element
+        if element_id == _CLUSTER or size is None:
+            break
+        if element_id == _INFO:
+            found_info = True
+            for child_id, value in _iter_elements(_read_payload(f, size)):
+                if child_id == _TIMECODE_SCALE:
+                    timecode_scale = _uint(value)
+                elif child_id == _DURATION:
+                    raw_duration = _float(value)
+        elif element_id == _TRACKS:
+            found_tracks = True
+            for child_id, value in _iter_elements(_read_payload(f, size)):
+                if child_id == _TRACK_ENTRY:
+                    _parse_track_entry(value, result)
+        else:
+            f.seek(size, 1)
+    
+    if raw_duration is not None:
+        result['duration'] = raw_duration * timecode_scale / 1e9
+    if result.get('fps') and result.get('duration'):
+        # Matroska headers carry no frame count; estimate it from the frame rate
+        result['frame_count'] = int(round(result['fps'] * result['duration']))
+    return result if 'duration' in result or 'width' in result else None
+
+
+def _parse_track_entry(entry: bytes, result: Dict[str, Any]):
+    fields = dict(_iter_elements(entry))
+    track_type = _uint(fields.get(_TRACK_TYPE, b''))
+    if track_type == 2:
+        result['has_audio'] = True
+    if track_type != 1 or 'width' in result:
+        return
+    if _CODEC_ID in fields:
+        result['codec'] = fields[_CODEC_ID].decode('ascii', 'replace').strip('\x00')
+    if _DEFAULT_DURATION in fields:
+        frame_ns = _uint(fields[_DEFAULT_DURATION])
+        if frame_ns:
+            result['fps'] = 1e9 / frame_ns
+    video = dict(_iter_elements(fields.get(_VIDEO, b'')))
+    if _PIXEL_WIDTH in video:
+        result['width'] = _uint(video[_PIXEL_WIDTH])
+    if _PIXEL_HEIGHT in video:
+        result['height'] = _uint(video[_PIXEL_HEIGHT])
+
+
+def _read_vint(f: BinaryIO, keep_marker: bool) -> Optional[Tuple[int, int]]:
+    """(value, length) of an EBML variable-length integer read from f."""
+    first = f.read(1)
+    if not first:
+        return None
+    byte = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not byte & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        return None
+    rest = f.read(length - 1)
+    if len(rest) < length - 1:
+        return None
+    value = byte if keep_marker else byte & (mask - 1)
+    for b in rest:
+        value = (value << 8) | b
+    return value, length
+
+
+def _read_element_header(f: BinaryIO) -> Optional[Tuple[int, Optional[int]]]:
+    """(element ID, payload size or None when unknown) of the next element."""
+    element_id = _read_vint(f, keep_marker=True)
+    size = _read_vint(f, keep_marker=False)
+    if element_id is None or size is None:
+        return None
+    value, length = size
+    unknown = value == (1 << (7 * length)) - 1
+    return element_id[0], None if unknown else value
+
+
+def _read_payload(f: BinaryIO, size: Optional[int]) -> bytes:
+    if size is None or size > MAX_EBML_ELEMENT_BYTES:
+        return b''
+    return f.read(size)
+
+
+def _iter_elements(data: bytes) -> Iterator[Tuple[int, bytes]]:
+    """(element ID, payload) of each element in an in-memory EBML payload."""
+    stream = io.BytesIO(data)
+    while stream.tell() < len(data):
+        header = _read_element_header(stream)
+        if header is None or header[1] is None:
+            return
+        payload = stream.read(header[1])
+        if len(payload) < header[1]:
+            return
+        yield header[0], payload
+
+
+def _uint(data: bytes) -> int:
+    return int.from_bytes(data, 'big') if data else 0
+
+
+def _float(data: bytes) -> Optional[float]:
+    if len(data) == 4:
+        return struct.unpack('>f', data)[0]
+    if len(data) == 8:
+        return struct.unpack('>d', data)[0]
+    return None
@@ -28,14 +28,28 @@ class DiscordVisualizer:
         plt.style.use('seaborn-v0_8')
         sns.set_palette("husl")
     
-    def create_message_timeline(self, messages: List[Dict], output_file: str = 'message_timeline.png'):
-        """Create a timeline visualization of messages."""
+    def create_message_timeline(self, messages: List[Any], output_file: str = 'message_timeline.png'):
+        """Create a timeline visualization of messages (dicts, ChatMessage records or a MessageStore)."""
         if not messages:
             return
         
-        # Convert to DataFrame
-        df = pd.DataFrame(messages)
-        df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+        # Convert to DataFrame, reading only the two columns we need.
+        # Parsed messages carry epoch-ms integers, so no string parsing is needed.
+        if hasattr(messages, 'timestamps_ms_array'):
+            df = pd.DataFrame({'timestamp_ms': messages.timestamps_ms_array(), 'author': list(messages.iter_authors())})
+        elif isinstance(messages[0], dict):
+            df = pd.DataFrame(messages)
+        else:
+            df = pd.DataFrame({
+                'timestamp_ms': np.fromiter((m.timestamp_ms for m in messages), dtype=np.int64, count=len(messages)),
+                'author': [m.author for m in messages]
+            })
+        
+        if 'timestamp_ms' in df:
+            df = df[df['timestamp_ms'] > 0]
+            df['timestamp'] = pd.to_datetime(df['timestamp_ms'], unit='ms')
+        else:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
         df = df.dropna(subset=['timestamp'])
         
         if df.empty:
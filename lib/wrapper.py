@@ -3,24 +3,294 @@ Gemini API Wrapper for Discord Chat Analysis
 Handles API calls, retries, rate limiting, and error management.
 """
 
+import re
 import json
 import time
+import asyncio
 import random
+import sqlite3
+import threading
 from typing import Dict, List, Optional, Any
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from .parser import format_timestamp
+from .cache import ResponseCache
+
+# Input token limits of the models this tool is used with
+MODEL_CONTEXT_WINDOWS = {
+    'gemini-1.5-flash': 1048576,
+    'gemini-1.5-flash-8b': 1048576,
+    'gemini-1.5-pro': 2097152,
+    'gemini-2.0-flash': 1048576,
+    'gemini-1.0-pro': 30720,
+}
+DEFAULT_CONTEXT_WINDOW = 30720
+MAX_OUTPUT_TOKENS = 8192
+# Room for the instructions and JSON template around the conversation text
+PROMPT_OVERHEAD_TOKENS = 2048
+DEFAULT_CHUNK_TOKENS = 60000
+# Token estimate for planning chunks: ~4 ASCII characters per token, while
+# emoji and non-Latin scripts take about a token per character
+ASCII_CHARS_PER_TOKEN = 4.0
+
+# "retry_delay { seconds: 37 }" (gRPC RetryInfo as text) or "Please retry in 37.5s"
+_RETRY_DELAY_RE = re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+)|retry in\s+(\d+(?:\.\d+)?)\s*s', re.IGNORECASE)
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every request made through a wrapper.
+    
+    Tokens refill at `rate` per second up to `burst`. A caller that finds the
+    bucket empty still takes its token (the balance goes negative) and is
+    told how long to wait, so concurrent callers are served in arrival order.
+    """
+    
+    def __init__(self, rate: float = 1.0, burst: int = 1):
+        if rate <= 0:
+            raise ValueError(f"Request rate must be greater than 0, got {rate}")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self) -> float:
+        """Take one token and return the number of seconds to wait before using it."""
+        with self._lock:
+            self._refill_locked()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+    
+    def acquire(self):
+        """Block until a request may be sent."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+    
+    def record_success(self):
+        """A request went through; a fixed-rate bucket ignores this."""
+    
+    def record_throttle(self, retry_after: Optional[float] = None):
+        """
+        The API refused a request for exceeding its quota.
+        
+        Drops any saved-up burst and, if the API said how long to back off,
+        holds every caller for that long.
+        """
+        with self._lock:
+            self._refill_locked()
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                # Debt of retry_after seconds' worth of tokens; concurrent
+                # throttles overlap instead of adding up
+                self._tokens = min(self._tokens, -retry_after * self.rate)
+    
+    def _refill_locked(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """
+    Token bucket whose rate follows the API's feedback (AIMD).
+    
+    Every successful request raises the rate by `increase` requests/second
+    up to `max_rate`; a throttled request halves it, at most once per
+    second so one burst of rejections counts as a single signal.
+    """
+    
+    def __init__(self, rate: float = 1.0, burst: int = 1, min_rate: float = 0.05,
+                 max_rate: Optional[float] = None, increase: float = 0.05, decrease: float = 0.5):
+        super().__init__(rate, burst)
+        self.min_rate = min(min_rate, rate)
+        self.max_rate = max(max_rate or rate, rate)
+        self.increase = increase
+        self.decrease = decrease
+        self._last_decrease = 0.0
+    
+    def record_success(self):
+        with self._lock:
+            self._refill_locked()
+            self.rate = min(self.max_rate, self.rate + self.increase)
+    
+    def record_throttle(self, retry_after: Optional[float] = None):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease >= 1.0:
+                self._refill_locked()
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._last_decrease = now
+        super().record_throttle(retry_after)
+
+
+def _is_throttle_error(error: Exception) -> bool:
+    """Whether the API rejected a request for exceeding its rate or quota (HTTP 429/503)."""
+    if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests,
+                          google_exceptions.ServiceUnavailable)):
+        return True
+    return getattr(error, 'code', None) in (429, 503)
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Back-off the API asked for, from RetryInfo details, a Retry-After header or the message."""
+    for detail in getattr(error, 'details', None) or []:
+        delay = getattr(detail, 'retry_delay', None)
+        if delay is None:
+            continue
+        if hasattr(delay, 'total_seconds'):
+            return delay.total_seconds()
+        return delay.seconds + delay.nanos / 1e9
+    
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('Retry-After'):
+            return float(headers['Retry-After'])
+    except (TypeError, ValueError):
+        pass
+    
+    match = _RETRY_DELAY_RE.search(str(error))
+    if match:
+        return float(match.group(1) or match.group(2))
+    return None
+
+
+class IncrementalJSONParser:
+    """
+    Decodes the first JSON object or array in text that arrives in pieces.
+    
+    Each piece is scanned once for brackets and quotes (anything before the
+    opening bracket, such as a markdown fence, is skipped), so the value can
+    be decoded the moment its closing bracket arrives rather than after the
+    whole response has been received.
+    """
+    
+    _OUTSIDE_STRING = re.compile(r'[{}\[\]"]')
+    _INSIDE_STRING = re.compile(r'["\\]')
+    
+    def __init__(self):
+        self.done = False
+        self.result = None
+        self._pieces = []
+        self._offset = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._skip_next = False
+    
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return ''.join(self._pieces)
+    
+    def feed(self, piece: str) -> bool:
+        """Add the next piece of text; returns True once a complete value was decoded."""
+        if self.done:
+            return True
+        base = self._offset
+        self._pieces.append(piece)
+        self._offset += len(piece)
+        
+        pos = 0
+        if self._skip_next and piece:
+            # The previous piece ended in a backslash inside a string
+            self._skip_next = False
+            pos = 1
+        
+        while True:
+            pattern = self._INSIDE_STRING if self._in_string else self._OUTSIDE_STRING
+            match = pattern.search(piece, pos)
+            if not match:
+                return False
+            ch = match.group()
+            pos = match.end()
+            
+            if ch == '\\':
+                # Skip the escaped character, which may start the next piece
+                if pos < len(piece):
+                    pos += 1
+                else:
+                    self._skip_next = True
+                    return False
+            elif ch == '"':
+                if self._start >= 0:
+                    self._in_string = not self._in_string
+            elif ch in '{[':
+                if self._start < 0:
+                    self._start = base + match.start()
+                self._depth += 1
+            elif self._start >= 0:
+                self._depth -= 1
+                if self._depth == 0 and self._decode(base + match.end()):
+                    return True
+    
+    def _decode(self, end: int) -> bool:
+        try:
+            self.result = json.loads(self.text[self._start:end])
+        except json.JSONDecodeError:
+            # Brackets balanced but not valid JSON: keep scanning for a later
+            # value, in this piece too, and leave the rest to the fallback parser
+            self._start = -1
+            return False
+        self.done = True
+        return True
+
+
+class BackgroundLoop:
+    """
+    An asyncio event loop running in a daemon thread.
+    
+    Lets synchronous code (including worker threads) submit coroutines that
+    all share one loop, so their requests are in flight together.
+    """
+    
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='gemini-event-loop', daemon=True)
+        self._thread.start()
+    
+    def run(self, coro):
+        """Run a coroutine on the loop and block until its result is ready."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+_shared_loop = None
+_shared_loop_lock = threading.Lock()
+
+
+def _background_loop() -> BackgroundLoop:
+    """The process-wide loop used by the blocking facade, started on first use."""
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            _shared_loop = BackgroundLoop()
+        return _shared_loop
 
 
 class GeminiWrapper:
     """Wrapper class for Gemini API calls with retry logic and error handling."""
     
-    def __init__(self, api_key: str, model_name: str = 'gemini-1.5-pro'):
+    # Fraction of the budget a chunk must reach before it may end at a pause
+    MIN_CHUNK_FILL = 0.75
+    
+    def __init__(self, api_key: str, model_name: str = 'gemini-1.5-pro',
+                 rate_limiter: Optional[RateLimiter] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 max_chunk_tokens: int = DEFAULT_CHUNK_TOKENS):
         """Initialize the Gemini wrapper."""
         self.api_key = api_key
         self.model_name = model_name
+        self.max_chunk_tokens = max_chunk_tokens
         self.model = None
         self.request_count = 0
         self.last_request_time = 0
-        self.min_request_interval = 1.0  # Minimum seconds between requests
+        self.rate_limiter = rate_limiter or RateLimiter(rate=1.0, burst=1)
+        self.response_cache = response_cache
+        self._stats_lock = threading.Lock()
         
         # Initialize the model
         genai.configure(api_key=api_key)
@@ -31,6 +301,10 @@ class GeminiWrapper:
         """
         Generate content using Gemini API with retry logic.
         
+        Blocking facade over generate_content_async: the request runs on the
+        shared background event loop, so calls from many threads are served
+        concurrently by one loop.
+        
         Args:
             prompt: The prompt to send to the model
             max_retries: Maximum number of retry attempts
@@ -40,60 +314,104 @@ class GeminiWrapper:
         Returns:
             Parsed JSON response or None if failed
         """
+        return _background_loop().run(
+            self.generate_content_async(prompt, max_retries=max_retries,
+                                        retry_delay=retry_delay, temperature=temperature)
+        )
+    
+    async def generate_content_async(self, prompt: str, max_retries: int = 3,
+                                     retry_delay: int = 5, temperature: float = 0.7) -> Optional[Dict]:
+        """
+        Generate content using the async Gemini API with retry logic.
+        
+        The response is streamed into an incremental JSON parser and the
+        stream is dropped as soon as the JSON value is complete.
+        """
+        # Identical prompts answered before (e.g. re-runs on the same export) skip the API
+        cache_key = None
+        if self.response_cache:
+            cache_key = self.response_cache.make_key(self.model_name, temperature, prompt)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return json.loads(cached)
+        
         for attempt in range(max_retries):
             try:
                 # Rate limiting
-                self._rate_limit()
+                await self._rate_limit_async()
                 
                 # Generate content
-                response = self.model.generate_content(
+                response = await self.model.generate_content_async(
                     prompt,
                     generation_config=genai.types.GenerationConfig(
                         temperature=temperature,
-                        max_output_tokens=8192,
-                    )
+                        max_output_tokens=MAX_OUTPUT_TOKENS,
+                    ),
+                    stream=True
                 )
                 
-                # Parse response
-                parsed_response = self._parse_response(response.text)
+                # Parse response as it arrives
+                parser = IncrementalJSONParser()
+                async for chunk in response:
+                    if parser.feed(chunk.text):
+                        break
+                parsed_response = parser.result if parser.done else self._parse_response(parser.text)
+                self.rate_limiter.record_success()
+                
                 if parsed_response:
-                    self.request_count += 1
-                    return parsed_response
+                    with self._stats_lock:
+                        self.request_count += 1
+                    break
                 
             except Exception as e:
                 error_msg = str(e)
                 print(f"API call failed (attempt {attempt + 1}/{max_retries}): {error_msg}")
                 
                 # Handle specific error types
-                if "quota" in error_msg.lower() or "rate" in error_msg.lower():
-                    # Quota/rate limit error - wait longer
-                    wait_time = retry_delay * (2 ** attempt) + random.uniform(1, 5)
-                    print(f"Rate limit hit. Waiting {wait_time:.1f} seconds...")
-                    time.sleep(wait_time)
-                elif "timeout" in error_msg.lower():
+                if _is_throttle_error(e):
+                    # Slow every caller down; with a retry-after hint the next attempt waits on the limiter
+                    retry_after = _retry_after_seconds(e)
+                    self.rate_limiter.record_throttle(retry_after)
+                    pause = f", pausing {retry_after:.1f} seconds" if retry_after else ""
+                    print(f"Rate limit hit. Slowing to {self.rate_limiter.rate:.2f} requests/second{pause}...")
+                    if not retry_after and attempt < max_retries - 1:
+                        # No hint: back off exponentially so the retries aren't spent at once
+                        wait_time = retry_delay * (2 ** attempt) + random.uniform(1, 5)
+                        print(f"Waiting {wait_time:.1f} seconds...")
+                        await asyncio.sleep(wait_time)
+                elif isinstance(e, (google_exceptions.DeadlineExceeded, asyncio.TimeoutError)):
                     # Timeout error - shorter wait
                     wait_time = retry_delay + random.uniform(1, 3)
                     print(f"Timeout error. Waiting {wait_time:.1f} seconds...")
-                    time.sleep(wait_time)
+                    await asyncio.sleep(wait_time)
                 else:
                     # Other errors - standard retry
                     if attempt < max_retries - 1:
                         wait_time = retry_delay + random.uniform(0, 2)
                         print(f"Retrying in {wait_time:.1f} seconds...")
-                        time.sleep(wait_time)
+                        await asyncio.sleep(wait_time)
+        else:
+            print(f"Failed to generate content after {max_retries} attempts")
+            return None
         
-        print(f"Failed to generate content after {max_retries} attempts")
-        return None
+        # Outside the retry loop: a cache failure must not resend a request that already succeeded
+        if cache_key:
+            try:
+                self.response_cache.set(cache_key, json.dumps(parsed_response, ensure_ascii=False))
+            except sqlite3.Error as e:
+                print(f"Warning: could not cache response: {e}")
+        return parsed_response
     
     def _rate_limit(self):
-        """Implement rate limiting between requests."""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.min_request_interval:
-            sleep_time = self.min_request_interval - time_since_last
-            time.sleep(sleep_time)
-        
+        """Wait for a token from the shared rate limiter."""
+        self.rate_limiter.acquire()
+        self.last_request_time = time.time()
+    
+    async def _rate_limit_async(self):
+        """Wait for a token from the shared rate limiter without blocking the event loop."""
+        wait = self.rate_limiter.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
         self.last_request_time = time.time()
     
     def _parse_response(self, response_text: str) -> Optional[Dict]:
@@ -135,13 +453,13 @@ class GeminiWrapper:
             print(f"Unexpected error parsing response: {e}")
             return None
     
-    def analyze_conversation_chunk(self, messages: List[Dict], chunk_num: int, 
+    def analyze_conversation_chunk(self, messages: List[Any], chunk_num: int, 
                                  total_chunks: int) -> Optional[Dict]:
         """
         Analyze a chunk of conversation messages.
         
         Args:
-            messages: List of message dictionaries
+            messages: List of ChatMessage records
             chunk_num: Current chunk number
             total_chunks: Total number of chunks
             
@@ -227,6 +545,48 @@ class GeminiWrapper:
         
         return self.generate_content(prompt)
     
+    def merge_chunk_analyses(self, analyses: List[Dict], level: int) -> Optional[Dict]:
+        """
+        Merge analyses of consecutive conversation segments into one of the same shape.
+        
+        Args:
+            analyses: Chunk analyses (or earlier merges), in conversation order
+            level: Depth in the merge tree, 1 for merges of chunk analyses
+            
+        Returns:
+            Merged analysis or None if failed
+        """
+        prompt = f"""
+        Merge these {len(analyses)} analyses of consecutive parts of one Discord
+        conversation (merge level {level}) into a single analysis of the whole span.
+        Keep the most important and recurring points, note how things changed
+        over time, and drop duplicates.
+        
+        Analyses, in conversation order:
+        {json.dumps(analyses, indent=2, ensure_ascii=False)}
+        
+        Provide the merged analysis in JSON format:
+        {{
+            "summary": "what happened over this span of the conversation",
+            "sentiment_analysis": {{
+                "overall_sentiment": "positive/negative/neutral/mixed",
+                "emotional_tone": "description of the emotional atmosphere and how it shifted",
+                "emotional_highlights": ["key emotional moments or shifts"]
+            }},
+            "topics": ["topic 1", "topic 2", "topic 3"],
+            "key_events": ["important event 1", "important event 2"],
+            "relationship_dynamics": {{
+                "interaction_patterns": "description",
+                "power_dynamics": "description",
+                "intimacy_level": "description",
+                "conflict_resolution": "description"
+            }},
+            "key_insights": ["insight 1", "insight 2", "insight 3"]
+        }}
+        """
+        
+        return self.generate_content(prompt)
+    
     def summarize_analysis(self, chunk_analyses: List[Dict], 
                           total_messages: int) -> Optional[Dict]:
         """
@@ -248,12 +608,17 @@ class GeminiWrapper:
         
         for i, analysis in enumerate(chunk_analyses):
             if analysis:
-                summary_data["chunk_summaries"].append({
+                chunk_summary = {
                     "chunk_number": i + 1,
                     "topics": analysis.get("topics", []),
                     "sentiment": analysis.get("sentiment_analysis", {}).get("overall_sentiment", "unknown"),
                     "key_insights": analysis.get("key_insights", [])
-                })
+                }
+                # Partial analyses merged by merge_chunk_analyses carry more detail
+                for key in ("summary", "key_events", "relationship_dynamics"):
+                    if analysis.get(key):
+                        chunk_summary[key] = analysis[key]
+                summary_data["chunk_summaries"].append(chunk_summary)
         
         prompt = f"""
         Create a comprehensive summary of this Discord conversation analysis.
@@ -283,65 +648,111 @@ class GeminiWrapper:
         
         return self.generate_content(prompt)
     
-    def _prepare_conversation_text(self, messages: List[Dict]) -> str:
-        """Prepare conversation text for analysis."""
-        conversation_lines = []
+    def plan_chunks(self, messages: List[Any]) -> List[List[Any]]:
+        """
+        Split messages into chunks whose conversation text fits the prompt budget.
         
-        for msg in messages:
-            # Extract time from timestamp
-            timestamp = msg.get('timestamp', 'Unknown time')
-            if ' ' in timestamp:
-                timestamp = timestamp.split(' ')[-1]
-            
-            # Clean author name
-            author = msg.get('author', 'Unknown')
-            author = author.replace('7h3 R3v3n4n7', 'Jason').replace('whatsfappening', 'Sarah')
-            
-            # Prepare content
-            content = msg.get('content', '').strip()
-            if not content:
-                content = "[No text content]"
-            
-            line = f"[{timestamp}] {author}: {content}"
-            
-            # Add attachment info
-            attachments = msg.get('attachments', [])
-            if attachments:
-                attachment_types = []
-                for attachment in attachments:
-                    if attachment.endswith(('.jpg', '.png', '.gif')):
-                        attachment_types.append('image')
-                    elif attachment.endswith(('.mp4', '.avi', '.mov')):
-                        attachment_types.append('video')
-                    elif attachment.endswith(('.ogg', '.mp3', '.wav')):
-                        attachment_types.append('audio')
-                    else:
-                        attachment_types.append('file')
-                line += f" [Shared: {', '.join(set(attachment_types))}]"
-            
-            # Add reaction info
-            reactions = msg.get('reactions', [])
-            if reactions:
-                reaction_emojis = [r.get('emoji', '') for r in reactions[:3]]
-                line += f" [Reactions: {', '.join(reaction_emojis)}]"
+        Messages are packed in order until the next one would overflow the
+        budget. Once a chunk is at least MIN_CHUNK_FILL full, the cut goes at
+        the longest pause between messages seen since then, so chunks tend
+        to end where the conversation did rather than mid-exchange.
+        """
+        budget = self.chunk_token_budget()
+        timestamps = [msg.timestamp_ms for msg in messages]
+        tokens = [self._estimate_tokens(self._format_message_line(msg)) for msg in messages]
+        
+        ranges = []
+        start = 0
+        used = 0.0
+        best_cut = None
+        best_gap = -1
+        for i in range(len(messages)):
+            if i > start and used + tokens[i] > budget:
+                cut = best_cut if best_cut is not None else i
+                ranges.append((start, cut))
+                start = cut
+                used = sum(tokens[cut:i])
+                best_cut = None
+                best_gap = -1
             
-            conversation_lines.append(line)
+            if i > start and used >= budget * self.MIN_CHUNK_FILL:
+                gap = timestamps[i] - timestamps[i - 1]
+                if gap >= best_gap:
+                    best_cut = i
+                    best_gap = gap
+            used += tokens[i]
+        
+        if start < len(messages):
+            ranges.append((start, len(messages)))
+        
+        return [messages[start:end] for start, end in ranges]
+    
+    def chunk_token_budget(self) -> int:
+        """Tokens of conversation text per chunk, within the model's context window."""
+        context_window = MODEL_CONTEXT_WINDOWS.get(self.model_name, DEFAULT_CONTEXT_WINDOW)
+        return max(1, min(self.max_chunk_tokens, context_window - MAX_OUTPUT_TOKENS - PROMPT_OVERHEAD_TOKENS))
+    
+    def _estimate_tokens(self, line: str) -> float:
+        """
+        Tokens a line of conversation text takes, estimated from the text alone.
+        
+        No count_tokens call is made, so the same messages always split into
+        the same chunks and resumed or cached runs find their earlier chunks.
+        """
+        other_chars = len(line) - len(line.encode('ascii', 'ignore'))
+        return (len(line) - other_chars) / ASCII_CHARS_PER_TOKEN + other_chars + 1
+    
+    def _prepare_conversation_text(self, messages: List[Any]) -> str:
+        """Prepare conversation text for analysis."""
+        conversation_lines = [self._format_message_line(msg) for msg in messages]
+        
+        # Chunks are planned to fit the prompt budget, so nothing is cut here
+        return '\n'.join(conversation_lines)
+    
+    def _format_message_line(self, msg: Any) -> str:
+        """Render one message as a line of conversation text."""
+        timestamp = format_timestamp(msg.timestamp_ms)
+        
+        # Clean author name
+        author = msg.author or 'Unknown'
+        author = author.replace('7h3 R3v3n4n7', 'Jason').replace('whatsfappening', 'Sarah')
+        
+        # Prepare content
+        content = msg.content.strip()
+        if not content:
+            content = "[No text content]"
+        
+        line = f"[{timestamp}] {author}: {content}"
+        
+        # Add attachment info
+        attachments = msg.attachments
+        if attachments:
+            attachment_types = []
+            for attachment in attachments:
+                if attachment.endswith(('.jpg', '.png', '.gif')):
+                    attachment_types.append('image')
+                elif attachment.endswith(('.mp4', '.avi', '.mov')):
+                    attachment_types.append('video')
+                elif attachment.endswith(('.ogg', '.mp3', '.wav')):
+                    attachment_types.append('audio')
+                else:
+                    attachment_types.append('file')
+            line += f" [Shared: {', '.join(set(attachment_types))}]"
         
-        # Limit total length
-        full_text = '\n'.join(conversation_lines)
-        if len(full_text) > 100000:
-            lines = conversation_lines
-            mid_point = len(lines) // 2
-            selected_lines = lines[:mid_point//2] + lines[mid_point + mid_point//2:]
-            full_text = '\n'.join(selected_lines)
-            full_text = f"[Note: This is a condensed version of {len(messages)} messages]\n\n{full_text}"
+        # Add reaction info
+        reactions = msg.reactions
+        if reactions:
+            reaction_emojis = [r.emoji for r in reactions[:3]]
+            line += f" [Reactions: {', '.join(reaction_emojis)}]"
         
-        return full_text
+        return line
     
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about API usage."""
         return {
             "total_requests": self.request_count,
             "model_name": self.model_name,
-            "last_request_time": self.last_request_time
+            "last_request_time": self.last_request_time,
+            "cache_hits": self.response_cache.hits if self.response_cache else 0,
+            "cache_misses": self.response_cache.misses if self.response_cache else 0
         }
@@ -0,0 +1,50 @@
+"""Tests for the message pre-filter."""
+
+from lib.filters import MessageFilter
+from lib.parser import ChatMessage, ConversationIndex, Reaction
+
+START_MS = 1672531200000  # 2023-01-01 00:00 UTC
+
+
+def message(message_id, author, content, offset_s=0, **fields):
+    return ChatMessage(message_id, author, author, '', content, timestamp_ms=START_MS + offset_s * 1000, **fields)
+
+
+def test_repeats_with_attachments_or_replies_are_kept():
+    messages = [
+        message('1', 'alice', 'look', 0, attachments=['files/a.png']),
+        message('2', 'alice', 'look', 10, attachments=['files/b.png']),
+        message('3', 'bob', 'nice', 20),
+        message('4', 'bob', 'nice', 30, reply_to='2'),
+        message('5', 'bob', 'nice', 40),
+    ]
+    kept = list(MessageFilter().apply(messages))
+
+    assert [msg.message_id for msg in kept] == ['1', '2', '3', '4']
+    assert kept[1].attachments == ('files/b.png',)
+    assert kept[3].reply_to == '2'
+
+
+def test_repeats_out_of_order_are_not_folded():
+    messages = [message('1', 'alice', 'hi', 60), message('2', 'alice', 'hi', 0)]
+    assert len(MessageFilter().apply(messages)) == 2
+
+
+def test_replies_to_merged_messages_follow_the_kept_message():
+    messages = [
+        message('1', 'alice', '', 0, attachments=['files/a.png'], reactions=[Reaction('👍', 2)]),
+        message('2', 'alice', '', 5, attachments=['files/b.png'], reactions=[Reaction('👍', 1), Reaction('🔥', 1)]),
+        message('3', 'bob', 'great', 10),
+        message('4', 'bob', 'great', 15),
+        message('5', 'carol', 'which one?', 20, reply_to='2'),
+        message('6', 'carol', 'agreed', 25, reply_to='4'),
+    ]
+    kept = list(MessageFilter().apply(messages))
+
+    assert [msg.message_id for msg in kept] == ['1', '3', '5', '6']
+    assert kept[0].attachments == ('files/a.png', 'files/b.png')
+    assert dict(kept[0].reactions) == {'👍': 3, '🔥': 1}
+    assert [msg.reply_to for msg in kept[2:]] == ['1', '3']
+    assert len(ConversationIndex(kept).reply_parent) == 2
+    # The input messages are left as they were
+    assert messages[4].reply_to == '2'
@@ -0,0 +1,55 @@
+"""Tests for the local analytics engine."""
+
+import numpy as np
+
+from lib.local_analytics import LocalAnalyzer, _pagerank
+from lib.parser import ChatMessage
+
+HOUR_MS = 3600 * 1000
+START_MS = 1672531200000  # 2023-01-01 00:00 UTC
+
+
+def make_messages(authors_and_offsets):
+    return [
+        ChatMessage(str(i), author, author, '', f"message {i} is good", timestamp_ms=START_MS + offset)
+        for i, (author, offset) in enumerate(authors_and_offsets)
+    ]
+
+
+def test_pagerank_without_edges_is_uniform():
+    empty = np.empty(0, dtype=np.int64)
+    ranks = _pagerank(empty, empty, 3)
+    assert ranks.shape == (3,)
+    assert np.allclose(ranks, 1 / 3)
+
+
+def test_single_author_conversation():
+    messages = make_messages([('alice', i * 60000) for i in range(5)])
+    analyzer = LocalAnalyzer()
+    stats = analyzer.compute(messages)
+
+    assert stats['message_count'] == 5
+    assert stats['centrality']['most_central'] is None
+    assert stats['centrality']['by_participant']['alice']['pagerank'] == 1.0
+    assert stats['latency']['overall']['responses'] == 0
+    assert 'alice' in analyzer.analysis_fields(stats)['participant_profiles']
+
+
+def test_no_edges_between_distant_messages():
+    # Replies more than a session gap apart are not responses, so the graph has no edges
+    messages = make_messages([('alice', 0), ('bob', 7 * HOUR_MS), ('alice', 14 * HOUR_MS)])
+    stats = LocalAnalyzer().compute(messages)
+
+    centrality = stats['centrality']
+    assert centrality['most_central'] is None
+    assert centrality['top_pairs'] == []
+    assert centrality['by_participant']['alice']['pagerank'] == centrality['by_participant']['bob']['pagerank']
+
+
+def test_latency_histogram_keeps_every_bucket():
+    # Responses of 30s, 10min and 2h, the last in the bucket ending at the default session gap
+    messages = make_messages([('alice', 0), ('bob', 30000), ('alice', 630000), ('bob', 630000 + 2 * HOUR_MS)])
+    histogram = LocalAnalyzer().compute(messages)['latency']['overall']['histogram']
+
+    assert list(histogram.values()) == [1, 0, 1, 0, 1]
+    assert sum(histogram.values()) == 3
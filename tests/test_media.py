@@ -0,0 +1,42 @@
+"""Tests for media file analysis."""
+
+import pytest
+
+from lib.media import MediaAnalyzer
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def gradient(mode, size=(400, 300)):
+    ramp = Image.linear_gradient('L').resize(size)
+    image = Image.merge('RGB', (ramp, ramp.transpose(Image.Transpose.ROTATE_180), ramp))
+    return image.quantize(16) if mode == 'P' else image.convert(mode)
+
+
+@pytest.mark.parametrize('name, mode', [('palette.gif', 'P'), ('bilevel.png', '1')])
+def test_analyze_image_without_reducible_mode(tmp_path, name, mode):
+    path = tmp_path / name
+    gradient(mode).save(path)
+
+    analysis = MediaAnalyzer(str(tmp_path)).analyze_file(str(path))
+
+    assert 'error' not in analysis
+    assert analysis['mode'] == mode
+    assert (analysis['width'], analysis['height']) == (400, 300)
+    assert len(analysis['dhash']) == 16
+    assert 'dominant_colors' in analysis
+
+
+def test_analyze_files_without_cache(tmp_path):
+    paths = []
+    for name, mode in (('a.png', 'RGB'), ('b.png', 'RGB'), ('c.gif', 'P')):
+        paths.append(str(tmp_path / name))
+        gradient(mode).save(paths[-1])
+
+    analyzer = MediaAnalyzer(str(tmp_path))
+    results = analyzer.analyze_multiple_files(paths)
+
+    assert results['total_errors'] == 0
+    assert [f['filename'] for f in results['analyses']] == ['a.png', 'b.png', 'c.gif']
+    # a.png and b.png are byte-identical copies
+    assert any({'a.png', 'b.png'} <= set(cluster['files']) for cluster in results['duplicates']['clusters'])